@@ -0,0 +1,244 @@
+"""Load-test the API in-process and save the results as JSON.
+
+Drives the FastAPI app through httpx's ASGI transport (no server, no
+network) against a freshly migrated and seeded SQLite database in a
+temporary directory, running each scenario for a fixed time with a number
+of concurrent clients:
+
+    login         POST /api/login
+    themes        GET  /api/themes
+    subthemes     GET  /api/themes/{id}/subthemes
+    next_sentence GET  /api/themes/{id}/next_sentence
+    progress      POST /api/progress
+    random        GET  /api/sentences/random
+
+    python benchmarks/api_load.py --seconds 5 --concurrency 10
+    python benchmarks/api_load.py --scenarios themes,random --compare benchmarks/results/abc1234.json
+
+Throughput and p50/p95/p99 latency per scenario are printed and written to
+benchmarks/results/<commit>.json (or --output), so runs on different
+commits can be compared with --compare.  --database-url runs against an
+existing, already bootstrapped database instead of a temporary one, e.g. one
+filled by generate_dataset.py:
+
+    python benchmarks/api_load.py --database-url sqlite:////tmp/large.db \
+        --email user1@example.com --password Synthetic1
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("login", "themes", "subthemes", "next_sentence", "progress", "random")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class Fixture:
+    """Ids and auth headers the scenarios need, read through the API itself."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    async def load(self, client):
+        response = await client.post("/api/login", json=self.credentials)
+        response.raise_for_status()
+        self.headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+        themes = (await client.get("/api/themes", headers=self.headers)).json()
+        self.parent_id = None
+        self.theme_id = None
+        for theme in themes:
+            subthemes = (await client.get(f"/api/themes/{theme['id']}/subthemes", headers=self.headers)).json()
+            with_sentences = [subtheme for subtheme in subthemes if subtheme["total_sentences"]]
+            if with_sentences:
+                self.parent_id = theme["id"]
+                self.theme_id = with_sentences[0]["id"]
+                break
+        if self.theme_id is None:
+            sys.exit("The database has no subtheme with sentences; seed it first")
+        sentences = (await client.get(f"/api/themes/{self.theme_id}/sentences")).json()
+        self.sentence_ids = [sentence["id"] for sentence in sentences]
+
+
+def scenario_request(name, fixture):
+    """Return a coroutine function issuing one request of scenario ``name``."""
+    headers = fixture.headers
+    if name == "login":
+        return lambda client: client.post("/api/login", json=fixture.credentials)
+    if name == "themes":
+        return lambda client: client.get("/api/themes", headers=headers)
+    if name == "subthemes":
+        return lambda client: client.get(f"/api/themes/{fixture.parent_id}/subthemes", headers=headers)
+    if name == "next_sentence":
+        return lambda client: client.get(f"/api/themes/{fixture.theme_id}/next_sentence", headers=headers)
+    if name == "progress":
+        return lambda client: client.post("/api/progress", headers=headers, json={
+            "theme_id": fixture.theme_id, "sentence_id": random.choice(fixture.sentence_ids)
+        })
+    if name == "random":
+        return lambda client: client.get("/api/sentences/random")
+    raise ValueError(f"Unknown scenario {name}")
+
+
+async def run_scenario(client, request, seconds, concurrency, warmup):
+    for _ in range(warmup):
+        await request(client)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await request(client)
+            latencies.append(time.perf_counter() - started)
+            # 404 is a valid answer for next_sentence once the theme is completed
+            if response.status_code >= 500 or response.status_code in (401, 422):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 50)),
+        "p95_ms": to_ms(percentile(latencies, 95)),
+        "p99_ms": to_ms(percentile(latencies, 99)),
+    }
+
+
+async def run(args, app):
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            fixture = Fixture({"email": args.email, "password": args.password})
+            await fixture.load(client)
+            for name in args.scenarios:
+                results[name] = await run_scenario(
+                    client, scenario_request(name, fixture), args.seconds, args.concurrency, args.warmup
+                )
+                print_result(name, results[name])
+    return results
+
+
+def print_result(name, result):
+    print(
+        f"{name:14} {result['requests']:7d} req {result['errors']:4d} err "
+        f"{result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+        f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms"
+    )
+
+
+def print_comparison(previous, current):
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('started_at')}):")
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        throughput = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0
+        p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0
+        print(f"{name:14} throughput {throughput:+7.1f}%  p95 {p95:+7.1f}%")
+
+
+def prepare_database(args):
+    """Point DATABASE_URL at the database to use; migrate and seed a temporary one."""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+        return None
+    directory = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(directory.name, "bench.db")
+    import bootstrap
+    bootstrap.migrate()
+    bootstrap.seed()
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before each scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--database-url", help="use this bootstrapped database instead of a temporary one")
+    parser.add_argument("--email", default="test1@mail.ru", help="user to log in as")
+    parser.add_argument("--password", default="Qwerty12")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # The app reads sentences_data.json and templates/ relative to the repo root
+    os.chdir(ROOT)
+    database = prepare_database(args)
+    import main as api
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": api.engine.url.render_as_string(hide_password=True),
+        "config": {"seconds": args.seconds, "concurrency": args.concurrency, "warmup": args.warmup},
+    }
+    try:
+        report["results"] = asyncio.run(run(args, api.app))
+    finally:
+        if database is not None:
+            api.engine.dispose()
+            database.cleanup()
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Compare database engine profiles under a mixed read/write workload.
+
+Worker threads repeatedly read a random sentence with its options and
+upsert a progress row (the same INSERT ... ON CONFLICT used by the API).
+
+SQLite: each profile runs against its own copy of the database file, once
+with SQLite's defaults (rollback journal, synchronous=FULL) and once with
+the WAL/mmap pragmas from database.py.
+
+    python benchmarks/engine_profiles.py --threads 8 --seconds 5
+
+Postgres: pass a scratch database URL (it writes user_progress rows) to
+compare pool profiles.
+
+    python benchmarks/engine_profiles.py --url postgresql://localhost/polish_bench
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SQLALCHEMY_DATABASE_URL, SQLITE_PRAGMAS, create_db_engine, is_sqlite, normalize_url
+from models import Sentence, User, UserProgress, WordOption
+
+SQLITE_PROFILES = {
+    "sqlite-defaults": {"sqlite_pragmas": {"journal_mode": "DELETE", "synchronous": "FULL"}},
+    "sqlite-tuned": {"sqlite_pragmas": SQLITE_PRAGMAS},
+}
+
+POSTGRES_PROFILES = {
+    "pg-small-pool": {"pool": {"pool_size": 2, "max_overflow": 0, "pool_pre_ping": False}},
+    "pg-default-pool": {"pool": {}},
+    "pg-default-no-pre-ping": {"pool": {"pool_pre_ping": False}},
+}
+
+
+def workload(engine, seconds, threads, write_ratio):
+    with engine.connect() as connection:
+        sentences = connection.execute(select(Sentence.id, Sentence.theme_id)).all()
+        user_id = connection.execute(select(User.id)).scalars().first()
+    if not sentences or user_id is None:
+        sys.exit("The database needs sentences and a user; run bootstrap.py first")
+    insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            sentence_id, theme_id = random.choice(sentences)
+            started = time.perf_counter()
+            try:
+                if random.random() < write_ratio:
+                    stmt = insert(UserProgress).values(
+                        user_id=user_id, theme_id=theme_id, current_sentence_index=1, completed_sentences=1
+                    )
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[UserProgress.user_id, UserProgress.theme_id],
+                        set_={"completed_sentences": UserProgress.completed_sentences + 1}
+                    )
+                    with engine.begin() as connection:
+                        connection.execute(stmt)
+                else:
+                    with engine.connect() as connection:
+                        connection.execute(
+                            select(Sentence.sentence, WordOption.word)
+                            .join(WordOption, WordOption.sentence_id == Sentence.id)
+                            .where(Sentence.id == sentence_id)
+                        ).all()
+            except Exception as e:
+                errors.append(e)
+                continue
+            local.append(time.perf_counter() - started)
+        latencies.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sorted(latencies), errors
+
+
+def report(name, latencies, errors, seconds):
+    if not latencies:
+        print(f"{name:<24} no successful operations, {len(errors)} errors")
+        return
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(
+        f"{name:<24} {len(latencies) / seconds:>8.0f} ops/s   "
+        f"p50 {p(0.50):6.2f} ms   p95 {p(0.95):6.2f} ms   p99 {p(0.99):6.2f} ms   errors {len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    url = normalize_url(args.url)
+
+    if is_sqlite(url):
+        source = url.split("///", 1)[1]
+        for name, options in SQLITE_PROFILES.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.db")
+                shutil.copy(source, path)
+                engine = create_db_engine(f"sqlite:///{path}", **options)
+                latencies, errors = workload(engine, args.seconds, args.threads, args.write_ratio)
+                engine.dispose()
+            report(name, latencies, errors, args.seconds)
+    else:
+        for name, options in POSTGRES_PROFILES.items():
+            engine = create_db_engine(url, **options)
+            latencies, errors = workload(engine, args.seconds, args.threads, args.write_ratio)
+            engine.dispose()
+            report(name, latencies, errors, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
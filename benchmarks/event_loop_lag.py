@@ -0,0 +1,86 @@
+"""Measure event-loop stalls caused by database work in ``async def`` endpoints.
+
+Drives the app in-process through httpx's ASGI transport while a heartbeat
+task records how late the loop wakes it up.  The catalog recheck interval is
+forced to zero so every request runs the fingerprint query (in a worker
+thread, see ``CatalogStore.get_async``).
+
+    python benchmarks/event_loop_lag.py --requests 500 --concurrency 50
+
+``--blocking`` runs the same load against the old pattern (a sync
+``SessionLocal()`` query inside the coroutine) for comparison.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from catalog import catalog_fingerprint, catalog_store
+
+HEARTBEAT_INTERVAL = 0.001
+
+
+async def heartbeat(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - started - HEARTBEAT_INTERVAL)
+
+
+async def blocking_request():
+    # What the async endpoints did before: a sync session on the event loop
+    db = main.SessionLocal()
+    try:
+        catalog_fingerprint(db)
+    finally:
+        db.close()
+
+
+async def run(requests, concurrency, blocking):
+    catalog_store.recheck_seconds = 0
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    lags = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/api/sentences/random")  # warm the catalog
+
+        async def one():
+            async with semaphore:
+                if blocking:
+                    await blocking_request()
+                else:
+                    await client.get("/api/sentences/random")
+
+        beat = asyncio.create_task(heartbeat(lags, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await beat
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    print(f"mode:            {'blocking sync session' if blocking else 'worker thread'}")
+    print(f"requests:        {requests} (concurrency {concurrency})")
+    print(f"throughput:      {requests / elapsed:.0f} req/s")
+    print(f"heartbeats:      {len(lags)}")
+    print(f"loop lag p50:    {statistics.median(lags_ms):.2f} ms")
+    print(f"loop lag p99:    {lags_ms[int(len(lags_ms) * 0.99) - 1]:.2f} ms")
+    print(f"loop lag max:    {lags_ms[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--blocking", action="store_true", help="measure the old sync-session pattern instead")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.blocking))
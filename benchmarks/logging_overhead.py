@@ -0,0 +1,112 @@
+"""Measure the per-request cost of request logging.
+
+Replays the output of one GET /api/themes request (a few lines per request
+plus four per theme, as the handler used to print) in four ways:
+
+* print: synchronous print() calls, as the handlers did before logging_setup;
+* logging-info: logger.debug() calls at the default INFO level (what runs now);
+* logging-debug-sampled: DEBUG enabled, LOG_DEBUG_SAMPLE_RATE of debug calls kept,
+  written by the QueueListener thread;
+* logging-debug-all: DEBUG enabled with every record kept.
+
+    python benchmarks/logging_overhead.py --requests 5000 --themes 8 --output /tmp/bench.log
+
+Point --output at a file, pipe or terminal to see how the destination
+affects the synchronous print() path; the default is os.devnull.
+"""
+import argparse
+import contextlib
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import LOG_DEBUG_SAMPLE_RATE, LOG_FORMAT, SampledLogger
+
+
+def print_request(themes, user):
+    print(f"Fetching themes for user: {user}")
+    print("Reading main themes from catalog")
+    print(f"Found {len(themes)} main themes")
+    print(f"Querying progress for user {user}")
+    for theme_id, name in themes:
+        print(f"Processing theme: {theme_id} - {name}")
+        print(f"Completed sentences: {0}")
+        print(f"Total sentences: {10}")
+        print(f"Added theme to response: {name}")
+    print(f"Returning {len(themes)} themes")
+
+
+def log_request(logger, themes, user):
+    logger.debug("Fetching themes for user: %s", user)
+    logger.debug("Reading main themes from catalog")
+    logger.debug("Found %d main themes", len(themes))
+    logger.debug("Querying progress for user %s", user)
+    for theme_id, name in themes:
+        logger.debug("Processing theme: %s - %s", theme_id, name)
+        logger.debug("Completed sentences: %s", 0)
+        logger.debug("Total sentences: %s", 10)
+        logger.debug("Added theme to response: %s", name)
+    logger.debug("Returning %d themes", len(themes))
+
+
+def queue_logger(stream, level, sample_rate):
+    log_queue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(log_queue)
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, writer)
+    logger = SampledLogger(logging.Logger(f"bench.{level}.{sample_rate}"))
+    logger.sample_rate = sample_rate
+    logger.logger.propagate = False
+    logger.logger.handlers = [handler]
+    logger.setLevel(level)
+    return logger, listener
+
+
+def run(name, requests, handle, finish=None):
+    started = time.perf_counter()
+    for _ in range(requests):
+        handle()
+    elapsed = time.perf_counter() - started
+    drained = elapsed
+    if finish is not None:
+        finish()
+        drained = time.perf_counter() - started
+    print(
+        f"{name:24} {elapsed / requests * 1e6:8.1f} us/request in the handler"
+        f" ({drained:.2f}s until written)",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--themes", type=int, default=8)
+    parser.add_argument("--sample-rate", type=float, default=LOG_DEBUG_SAMPLE_RATE)
+    parser.add_argument("--output", default=os.devnull)
+    args = parser.parse_args()
+
+    themes = [(theme_id, f"Theme {theme_id}") for theme_id in range(1, args.themes + 1)]
+    user = "test1@mail.ru"
+    with open(args.output, "w", buffering=1) as stream:
+        with contextlib.redirect_stdout(stream):
+            run("print", args.requests, lambda: print_request(themes, user), stream.flush)
+
+        for name, level, rate in (
+            ("logging-info", logging.INFO, args.sample_rate),
+            ("logging-debug-sampled", logging.DEBUG, args.sample_rate),
+            ("logging-debug-all", logging.DEBUG, 1.0),
+        ):
+            logger, listener = queue_logger(stream, level, rate)
+            listener.start()
+            run(name, args.requests, lambda: log_request(logger, themes, user), listener.stop)
+
+
+if __name__ == "__main__":
+    main()
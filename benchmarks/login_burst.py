@@ -0,0 +1,74 @@
+"""Measure content-read latency while a burst of logins is in progress.
+
+Fires --logins concurrent POST /api/login requests and, at the same time,
+reads GET /api/themes/{id}/sentences one after another, in-process through
+httpx's ASGI transport.  Run it from the repo root against a bootstrapped
+database:
+
+    python benchmarks/login_burst.py --logins 60 --reads 200
+
+Reads are sync endpoints served by the AnyIO threadpool; logins should not
+slow them down now that bcrypt runs in the password process pool.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(args):
+    import httpx
+
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    credentials = {"email": args.email, "password": args.password}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Start the password workers before measuring
+            (await client.post("/api/login", json=credentials)).raise_for_status()
+            sentence = (await client.get("/api/sentences/random")).json()
+            url = f"/api/themes/{sentence['theme_id']}/sentences"
+
+            async def reads():
+                latencies = []
+                for _ in range(args.reads):
+                    started = time.perf_counter()
+                    (await client.get(url)).raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                return latencies
+
+            idle = await reads()
+            started = time.perf_counter()
+            logins = asyncio.gather(*(client.post("/api/login", json=credentials) for _ in range(args.logins)))
+            busy, responses = await asyncio.gather(reads(), logins)
+            elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    for name, latencies in (("reads alone", idle), ("reads during burst", busy)):
+        latencies.sort()
+        print(
+            f"{name:20} p50 {statistics.median(latencies) * 1000:8.2f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:8.2f} ms  "
+            f"max {latencies[-1] * 1000:8.2f} ms"
+        )
+    print(f"{args.logins} logins finished in {elapsed:.2f}s, status codes {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--email", default="test1@mail.ru")
+    parser.add_argument("--password", default="Qwerty12")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
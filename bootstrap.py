@@ -0,0 +1,67 @@
+"""Prepare the database before the app starts: migrate, then seed if empty.
+
+    python bootstrap.py [--no-seed]
+
+Runs the Alembic migrations up to head, imports sentences_data.json when
+there are no sentences yet and creates the test user when there are no
+users.  The API itself never changes the schema; it only checks that the
+database is at the latest revision.
+"""
+import argparse
+import os
+from datetime import datetime
+
+from alembic import command
+
+from database import SessionLocal
+from passwords import pwd_context
+from models import Sentence, User
+from schema import alembic_config
+
+SEED_CONTENT_PATH = "sentences_data.json"
+TEST_USER_EMAIL = "test1@mail.ru"
+TEST_USER_PASSWORD = "Qwerty12"
+
+
+def migrate():
+    config = alembic_config()
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+    print("Database schema is up to date")
+
+
+def seed():
+    db = SessionLocal()
+    try:
+        has_sentences = db.query(Sentence.id).first() is not None
+        has_users = db.query(User.id).first() is not None
+    finally:
+        db.close()
+
+    if not has_sentences and os.path.exists(SEED_CONTENT_PATH):
+        from import_sentences import bulk_import_sentences
+        print(f"Importing sentences from {SEED_CONTENT_PATH}...")
+        bulk_import_sentences(SEED_CONTENT_PATH)
+
+    if not has_users:
+        print("Creating test user...")
+        db = SessionLocal()
+        try:
+            db.add(User(
+                email=TEST_USER_EMAIL,
+                hashed_password=pwd_context.hash(TEST_USER_PASSWORD),
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+        finally:
+            db.close()
+        print("Test user created successfully")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate and seed the database")
+    parser.add_argument("--no-seed", action="store_true", help="only run migrations")
+    args = parser.parse_args()
+    migrate()
+    if not args.no_seed:
+        seed()
@@ -0,0 +1,341 @@
+"""Read-only in-memory snapshot of the content catalog.
+
+Themes, sentences and word options only change when content is written
+(``POST /api/themes``, ``POST /api/sentences`` or ``import_sentences.py``),
+so the read endpoints serve them from an immutable ``Catalog`` snapshot
+instead of querying the database on every request.  A snapshot is never
+mutated after it is built; writers call ``catalog_store.invalidate()`` and
+the next reader builds a fresh snapshot and swaps it in.  Writes made by
+other processes (the import script, other workers) are picked up by a cheap
+fingerprint check every ``CATALOG_RECHECK_SECONDS`` seconds; readers keep
+getting the previous snapshot while one of them rebuilds it.
+"""
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Theme, Sentence, WordOption
+
+CATALOG_RECHECK_SECONDS = float(os.getenv("CATALOG_RECHECK_SECONDS", "30"))
+
+
+@dataclass(frozen=True)
+class CatalogOption:
+    unique_id: str
+    word: str
+    is_correct: bool
+
+    def as_dict(self) -> dict:
+        return {"unique_id": self.unique_id, "word": self.word, "is_correct": self.is_correct}
+
+
+@dataclass(frozen=True)
+class CatalogSentence:
+    id: int
+    sentence: str
+    tense: str
+    difficulty_level: int
+    theme_id: int
+    order_in_theme: int
+    word_options: Tuple[CatalogOption, ...]
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "sentence": self.sentence,
+            "tense": self.tense,
+            "difficulty_level": self.difficulty_level,
+            "word_options": [opt.as_dict() for opt in self.word_options],
+            "theme_id": self.theme_id,
+            "order_in_theme": self.order_in_theme,
+        }
+
+
+@dataclass(frozen=True)
+class CatalogTheme:
+    id: int
+    name: str
+    description: Optional[str]
+    parent_theme_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    total_sentences: int
+    content_version: int
+
+
+class SentenceSampler:
+    """Constant-time random sentence picks filtered by theme, tense and difficulty.
+
+    For every sentence, its position in ``Catalog.sentences`` is appended to
+    one bucket per combination of filters it satisfies, with ``None`` meaning
+    "any".  A theme filter matches sentences of the theme and of all its
+    subthemes.  A pick is then a single ``random.choice`` on one bucket.
+    """
+
+    def __init__(self, sentences: Tuple[CatalogSentence, ...], parents: Dict[int, Optional[int]]):
+        buckets: Dict[tuple, array] = {}
+        for position, sentence in enumerate(sentences):
+            theme_keys = [None]
+            theme_id = sentence.theme_id
+            while theme_id is not None and theme_id not in theme_keys:
+                theme_keys.append(theme_id)
+                theme_id = parents.get(theme_id)
+            for theme_key in theme_keys:
+                for tense_key in (None, sentence.tense):
+                    for difficulty_key in (None, sentence.difficulty_level):
+                        key = (theme_key, tense_key, difficulty_key)
+                        bucket = buckets.get(key)
+                        if bucket is None:
+                            bucket = buckets[key] = array("l")
+                        bucket.append(position)
+        self._sentences = sentences
+        self._buckets = buckets
+
+    def count(self, theme_id: Optional[int] = None, tense: Optional[str] = None,
+              difficulty_level: Optional[int] = None) -> int:
+        return len(self._buckets.get((theme_id, tense, difficulty_level), ()))
+
+    def choice(self, theme_id: Optional[int] = None, tense: Optional[str] = None,
+               difficulty_level: Optional[int] = None) -> Optional[CatalogSentence]:
+        """A random sentence matching all given filters, or ``None`` if there is none."""
+        bucket = self._buckets.get((theme_id, tense, difficulty_level))
+        if not bucket:
+            return None
+        return self._sentences[random.choice(bucket)]
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """One immutable version of the content catalog.
+
+    The dict fields are built once in ``build_catalog`` and must not be
+    modified afterwards; every reader holding a reference sees the same data.
+    """
+    version: int
+    fingerprint: tuple
+    themes: Dict[int, CatalogTheme]
+    root_theme_ids: Tuple[int, ...]
+    children: Dict[int, Tuple[int, ...]]
+    sentences_by_theme: Dict[int, Tuple[CatalogSentence, ...]]
+    sentence_keys_by_theme: Dict[int, Tuple[Tuple[int, int], ...]]
+    sentences: Tuple[CatalogSentence, ...]
+    sampler: SentenceSampler
+
+    def get_theme(self, theme_id: int) -> Optional[CatalogTheme]:
+        return self.themes.get(theme_id)
+
+    def root_themes(self) -> List[CatalogTheme]:
+        return [self.themes[theme_id] for theme_id in self.root_theme_ids]
+
+    def all_subthemes(self, theme_id: int) -> List[CatalogTheme]:
+        """All descendants of a theme, depth-first, like ``Theme.get_all_subthemes``."""
+        result = []
+        stack = list(reversed(self.children.get(theme_id, ())))
+        while stack:
+            child_id = stack.pop()
+            result.append(self.themes[child_id])
+            stack.extend(reversed(self.children.get(child_id, ())))
+        return result
+
+    def theme_sentences(self, theme_id: int) -> Tuple[CatalogSentence, ...]:
+        """Sentences of a theme ordered by ``order_in_theme``."""
+        return self.sentences_by_theme.get(theme_id, ())
+
+    def theme_sentences_page(self, theme_id: int, after: Optional[Tuple[int, int]],
+                             limit: int) -> Tuple[Tuple[CatalogSentence, ...], Optional[Tuple[int, int]]]:
+        """Keyset page of a theme's sentences after the (order_in_theme, id) key ``after``.
+
+        Returns the page and the key to pass as ``after`` for the next page,
+        or ``None`` when this is the last page.
+        """
+        sentences = self.sentences_by_theme.get(theme_id, ())
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(self.sentence_keys_by_theme.get(theme_id, ()), after)
+        page = sentences[start:start + limit]
+        if start + limit >= len(sentences):
+            return page, None
+        last = page[-1]
+        return page, (last.order_in_theme, last.id)
+
+
+def catalog_fingerprint(db: Session) -> tuple:
+    """Counts and max ids of the content tables plus the sum of theme content versions.
+
+    Changes whenever content is added or removed, or a writer bumps a
+    theme's ``content_version``.
+    """
+    columns = []
+    for model in (Theme, Sentence, WordOption):
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.max(model.id)).scalar_subquery())
+    columns.append(select(func.coalesce(func.sum(Theme.content_version), 0)).scalar_subquery())
+    return tuple(db.execute(select(*columns)).one())
+
+
+def build_catalog(db: Session, version: int, fingerprint: tuple) -> Catalog:
+    """Load the whole catalog with three queries (themes, sentences, options)."""
+    options_by_sentence: Dict[int, List[CatalogOption]] = {}
+    option_rows = db.execute(
+        select(WordOption.sentence_id, WordOption.unique_id, WordOption.word, WordOption.is_correct)
+        .order_by(WordOption.sentence_id, WordOption.id)
+    )
+    for sentence_id, unique_id, word, is_correct in option_rows:
+        options_by_sentence.setdefault(sentence_id, []).append(
+            CatalogOption(unique_id=unique_id, word=word, is_correct=is_correct)
+        )
+
+    sentences = []
+    by_theme: Dict[int, List[CatalogSentence]] = {}
+    sentence_rows = db.execute(
+        select(
+            Sentence.id, Sentence.sentence, Sentence.tense, Sentence.difficulty_level,
+            Sentence.theme_id, Sentence.order_in_theme,
+        ).order_by(Sentence.theme_id, Sentence.order_in_theme, Sentence.id)
+    )
+    for row in sentence_rows:
+        sentence = CatalogSentence(
+            id=row.id,
+            sentence=row.sentence,
+            tense=row.tense,
+            difficulty_level=row.difficulty_level,
+            theme_id=row.theme_id,
+            order_in_theme=row.order_in_theme,
+            word_options=tuple(options_by_sentence.get(row.id, ())),
+        )
+        sentences.append(sentence)
+        by_theme.setdefault(row.theme_id, []).append(sentence)
+
+    themes = {}
+    root_ids = []
+    children: Dict[int, List[int]] = {}
+    theme_rows = db.execute(
+        select(
+            Theme.id, Theme.name, Theme.description, Theme.parent_theme_id,
+            Theme.created_at, Theme.updated_at, Theme.content_version,
+        ).order_by(Theme.id)
+    )
+    for row in theme_rows:
+        themes[row.id] = CatalogTheme(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            parent_theme_id=row.parent_theme_id,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            total_sentences=len(by_theme.get(row.id, ())),
+            content_version=row.content_version,
+        )
+        if row.parent_theme_id is None:
+            root_ids.append(row.id)
+        else:
+            children.setdefault(row.parent_theme_id, []).append(row.id)
+
+    sentences = tuple(sentences)
+    parents = {theme_id: theme.parent_theme_id for theme_id, theme in themes.items()}
+    return Catalog(
+        version=version,
+        fingerprint=fingerprint,
+        themes=themes,
+        root_theme_ids=tuple(root_ids),
+        children={theme_id: tuple(ids) for theme_id, ids in children.items()},
+        sentences_by_theme={theme_id: tuple(items) for theme_id, items in by_theme.items()},
+        sentence_keys_by_theme={
+            theme_id: tuple((item.order_in_theme, item.id) for item in items)
+            for theme_id, items in by_theme.items()
+        },
+        sentences=sentences,
+        sampler=SentenceSampler(sentences, parents),
+    )
+
+
+class CatalogStore:
+    """Holds the current ``Catalog`` and swaps in a new one when content changes.
+
+    Snapshots are built outside ``_lock``, which only guards the swap.  The
+    async path does its fingerprint checks and builds in a worker thread
+    with a sync session from ``session_factory`` (``database.SessionLocal``
+    by default), so the event loop never runs them.  ``invalidate`` bumps a
+    generation counter and a build that started before it is not swapped in.
+    """
+
+    def __init__(self, recheck_seconds: float = CATALOG_RECHECK_SECONDS, session_factory=None):
+        self.recheck_seconds = recheck_seconds
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._catalog: Optional[Catalog] = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self._versions = itertools.count(1)
+
+    def _is_fresh(self, catalog: Optional[Catalog]) -> bool:
+        return catalog is not None and time.monotonic() - self._checked_at < self.recheck_seconds
+
+    def _swap(self, catalog: Catalog, generation: int) -> Catalog:
+        with self._lock:
+            if generation == self._generation:
+                self._catalog = catalog
+                self._checked_at = time.monotonic()
+        return catalog
+
+    def get(self, db: Session) -> Catalog:
+        """Return the current snapshot, rebuilding it from ``db`` if it is missing or stale.
+
+        Only a missing snapshot makes readers wait.  A stale one is rechecked
+        (and rebuilt when the fingerprint changed) by a single reader while
+        the others keep getting the current snapshot.
+        """
+        catalog = self._catalog
+        if self._is_fresh(catalog):
+            return catalog
+        if not self._refresh_lock.acquire(blocking=catalog is None):
+            return catalog
+        try:
+            catalog = self._catalog
+            if self._is_fresh(catalog):
+                return catalog
+            generation = self._generation
+            fingerprint = catalog_fingerprint(db)
+            if catalog is None or catalog.fingerprint != fingerprint:
+                catalog = build_catalog(db, next(self._versions), fingerprint)
+            return self._swap(catalog, generation)
+        finally:
+            self._refresh_lock.release()
+
+    def _get_with_new_session(self) -> Catalog:
+        session_factory = self.session_factory
+        if session_factory is None:
+            from database import SessionLocal as session_factory
+        db = session_factory()
+        try:
+            return self.get(db)
+        finally:
+            db.close()
+
+    async def get_async(self) -> Catalog:
+        """Async variant of ``get``; the database work runs in a worker thread."""
+        catalog = self._catalog
+        if self._is_fresh(catalog) or (catalog is not None and self._refresh_lock.locked()):
+            return catalog
+        return await asyncio.to_thread(self._get_with_new_session)
+
+    def invalidate(self) -> None:
+        """Drop the current snapshot; call after committing a content write."""
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+
+
+catalog_store = CatalogStore()
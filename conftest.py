@@ -0,0 +1,96 @@
+"""Shared pytest fixtures: the app on a temporary migrated and seeded database.
+
+The engines in database.py are created at import time, so DATABASE_URL is
+pointed at the temporary database here, before any test imports the app.
+"""
+import os
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_database_dir = tempfile.TemporaryDirectory(prefix="polish-grammar-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_database_dir.name, "test.db")
+# The cheapest bcrypt cost; tests log in and register a lot
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Tests invalidate the catalog after content writes; no fingerprint checks mid-test
+os.environ.setdefault("CATALOG_RECHECK_SECONDS", "3600")
+
+# Test-only pytest plugins: the query_budget fixture (see query_budget.py)
+pytest_plugins = ["query_budget"]
+# Scripts run by hand, not tests: test_api.py calls a running server
+collect_ignore = ["test_api.py", "benchmarks"]
+
+
+@pytest.fixture(scope="session")
+def app():
+    # sentences_data.json and templates/ are read relative to the repo root
+    os.chdir(ROOT)
+    import bootstrap
+    bootstrap.migrate()
+    bootstrap.seed()
+    import main
+    yield main.app
+    main.engine.dispose()
+    _database_dir.cleanup()
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def headers(client):
+    """Auth headers of the seeded test user."""
+    from bootstrap import TEST_USER_EMAIL, TEST_USER_PASSWORD
+    response = client.post("/api/login", json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+def clear_content(db):
+    """Delete all themes, sentences, word options and progress (users stay)."""
+    from sqlalchemy import delete
+    from models import Sentence, Theme, UserProgress, WordOption
+    for model in (UserProgress, WordOption, Sentence):
+        db.execute(delete(model))
+    db.execute(delete(Theme).where(Theme.parent_theme_id.isnot(None)))
+    db.execute(delete(Theme))
+
+
+@pytest.fixture
+def replace_content(app):
+    """``replace_content(fill)`` empties the content tables, then calls ``fill(db)`` and commits.
+
+    Returns what ``fill`` returns.  The seed content is imported again afterwards.
+    """
+    import main
+    from bootstrap import SEED_CONTENT_PATH
+    from catalog import catalog_store
+    from import_sentences import bulk_import_sentences
+
+    def replace_content(fill):
+        db = main.SessionLocal()
+        try:
+            clear_content(db)
+            db.commit()
+            result = fill(db)
+            db.commit()
+        finally:
+            db.close()
+        catalog_store.invalidate()
+        return result
+
+    yield replace_content
+    db = main.SessionLocal()
+    try:
+        clear_content(db)
+        db.commit()
+    finally:
+        db.close()
+    bulk_import_sentences(SEED_CONTENT_PATH)
+    catalog_store.invalidate()
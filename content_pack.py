@@ -0,0 +1,88 @@
+"""Streaming readers for sentence content packs.
+
+Two formats are accepted:
+
+* the JSON array of ``sentences_data.json``, one entry per theme/subtheme
+  holding a ``sentences`` list;
+* JSONL, one sentence per line with its theme given either as
+  ``theme``/``subtheme`` or as a ``theme_path`` list (the format written by
+  ``GET /api/export/sentences``).
+
+Both are read incrementally and flattened into ``SentenceRecord`` tuples, so
+memory use is bounded by a single theme entry (array) or line (JSONL), not
+by the size of the pack.
+"""
+import json
+from collections import namedtuple
+
+READ_SIZE = 1 << 16
+
+# theme_path: tuple of theme names from the root; order_in_theme: position in the theme
+SentenceRecord = namedtuple("SentenceRecord", ["theme_path", "order_in_theme", "sentence"])
+
+
+def iter_json_array(f, read_size=READ_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(read_size)
+    pos = 0
+    eof = not buf
+
+    def skip(chars):
+        nonlocal pos
+        while pos < len(buf) and buf[pos] in chars:
+            pos += 1
+
+    skip(" \t\r\n")
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("Content pack is not a JSON array")
+    pos += 1
+    while True:
+        skip(" \t\r\n,")
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            if pos >= len(buf):
+                raise json.JSONDecodeError("Need more data", buf, pos)
+            element, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Keep the unparsed tail and read at least as much again
+            more = f.read(max(read_size, len(buf) - pos))
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield element
+
+
+def iter_records(path):
+    """Yield a ``SentenceRecord`` for every sentence in the pack at ``path``."""
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            for entry in iter_json_array(f):
+                theme_path = (entry["theme"], entry["subtheme"]) if entry.get("subtheme") else (entry["theme"],)
+                for idx, sent in enumerate(entry["sentences"]):
+                    yield SentenceRecord(theme_path, idx, sent)
+            return
+
+        # JSONL: number sentences per theme in file order unless the line has its own order
+        next_order = {}
+        for line in f:
+            if not line.strip():
+                continue
+            sent = json.loads(line)
+            if "theme_path" in sent:
+                theme_path = tuple(sent["theme_path"])
+            elif sent.get("subtheme"):
+                theme_path = (sent["theme"], sent["subtheme"])
+            else:
+                theme_path = (sent["theme"],)
+            order = sent.get("order_in_theme", next_order.get(theme_path, 0))
+            next_order[theme_path] = order + 1
+            yield SentenceRecord(theme_path, order, sent)
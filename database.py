@@ -1,26 +1,107 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-import logging
+import os
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+def normalize_url(url: str) -> str:
+    """Accept the postgres:// scheme Render and Heroku put in DATABASE_URL."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=True  # Enable SQL logging
-)
+SQLALCHEMY_DATABASE_URL = normalize_url(os.getenv("DATABASE_URL", "sqlite:///./database.db"))
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+# Applied to every new SQLite connection. WAL lets readers run alongside a
+# writer, synchronous=NORMAL is durable under WAL, mmap and a larger page
+# cache (negative cache_size is in KiB) cut read syscalls.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+}
+
+# Connection pool profile for Postgres
+POSTGRES_POOL = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+}
+
+# Pool for file-based SQLite: the sync engine's QueuePool defaults, also used
+# by the async engine, which would otherwise get a NullPool and open a new
+# connection (and aiosqlite thread, and run the pragmas) for every session
+SQLITE_POOL = {"pool_size": 5, "max_overflow": 10}
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def is_sqlite_file(url: str) -> bool:
+    return is_sqlite(url) and ":memory:" not in url and "mode=memory" not in url and not url.endswith("://")
+
+def set_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def engine_options(url: str, pool=None) -> dict:
+    if is_sqlite(url):
+        options = {"connect_args": {"check_same_thread": False}, "echo": SQL_ECHO}
+        if is_sqlite_file(url):
+            options.update(SQLITE_POOL)
+        return options
+    return {**POSTGRES_POOL, **(pool or {}), "echo": SQL_ECHO}
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, sqlite_pragmas=None, pool=None):
+    """Create the sync engine for `url` with the SQLite pragmas or Postgres pool profile."""
+    engine = create_engine(url, **engine_options(url, pool))
+    if is_sqlite(url):
+        set_sqlite_pragmas(engine, SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas)
+    return engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """Swap a sync database URL to its asyncio driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Create the async engine for `url`, pooled like the sync one."""
+    options = {key: value for key, value in engine_options(url).items() if key != "connect_args"}
+    if is_sqlite_file(url):
+        options["poolclass"] = AsyncAdaptedQueuePool
+    async_engine = create_async_engine(to_async_url(url), **options)
+    if is_sqlite(url):
+        set_sqlite_pragmas(async_engine.sync_engine, SQLITE_PRAGMAS)
+    return async_engine
+
+# Async engine for `async def` endpoints, so database I/O does not block the event loop
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
     try:
-        logging.info("Database session created")
         yield db
-    except Exception as e:
-        logging.error(f"Database session error: {e}")
-        raise
     finally:
-        logging.info("Closing database session")
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
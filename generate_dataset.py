@@ -0,0 +1,232 @@
+"""Fill an empty database with a large synthetic dataset for capacity testing.
+
+    python generate_dataset.py --users 1000000 --themes 200 --depth 3 \\
+        --sentences 500000 --options 2000000 --progress 5000000 --seed 42
+
+The database comes from DATABASE_URL, as for the app.  It is migrated first
+and must not contain any themes, sentences or users yet.  Everything is
+derived from --seed (names, tree shape, word options, progress), so two runs
+with the same arguments produce the same rows.  Rows are written with
+executemany in batches of --batch-size, one transaction per batch.
+
+Themes form a --depth level tree and sentences go to the leaf themes.  All
+users share the password --password, hashed once with a salt drawn from
+the seed.
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import bcrypt
+from passlib.utils.binary import bcrypt64
+from sqlalchemy import func, insert, select, text
+
+from bootstrap import migrate
+from database import engine
+from models import Sentence, Theme, User, UserProgress, WordOption
+from passwords import BCRYPT_ROUNDS
+
+BASE_TIME = datetime(2024, 1, 1)
+TENSES = ("present", "past", "future")
+DIFFICULTY_LEVELS = (1, 2, 3, 4, 5)
+WORDS = (
+    "kot", "dom", "szkoła", "książka", "rano", "wieczorem", "często", "nigdy", "z przyjaciółmi",
+    "w parku", "na dworcu", "po pracy", "bardzo", "szybko", "razem", "w Krakowie", "jutro", "wczoraj",
+)
+VERBS = ("jest", "był", "będzie", "ma", "czyta", "pisze", "idzie", "robi", "lubi", "widzi", "mówi", "je")
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+    def write(self, model, rows):
+        """Insert ``rows`` (an iterable of dicts) with executemany, one transaction per batch."""
+        table = model.__table__
+        batch = []
+        count = 0
+        started = time.perf_counter()
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.args.batch_size:
+                count += self._flush(table, batch)
+                batch = []
+        count += self._flush(table, batch)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"{table.name}: {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)")
+
+    def _flush(self, table, batch):
+        if batch:
+            with engine.begin() as connection:
+                connection.execute(insert(table), batch)
+        return len(batch)
+
+    def timestamp(self):
+        return BASE_TIME + timedelta(seconds=self.rng.randrange(365 * 24 * 3600))
+
+    def themes(self):
+        """Theme rows of a tree with about the same fan-out on every level."""
+        total, depth = self.args.themes, self.args.depth
+        fan_out = max(1, round(total ** (1 / depth)))
+        levels = []
+        next_id = 1
+        remaining = total
+        for level in range(depth):
+            size = remaining if level == depth - 1 else min(remaining, fan_out ** (level + 1))
+            levels.append(list(range(next_id, next_id + size)))
+            next_id += size
+            remaining -= size
+        parents = {}
+        children = {}
+        for level, ids in enumerate(levels):
+            for theme_id in ids:
+                parent_id = self.rng.choice(levels[level - 1]) if level else None
+                parents[theme_id] = parent_id
+                children.setdefault(parent_id, []).append(theme_id)
+        self.leaf_ids = [theme_id for theme_id in parents if theme_id not in children]
+        rows = []
+        for theme_id, parent_id in parents.items():
+            created_at = self.timestamp()
+            rows.append({
+                "id": theme_id,
+                "name": f"Theme {theme_id}",
+                "description": f"Synthetic theme {theme_id}, level {self.level(theme_id, parents)}",
+                "parent_theme_id": parent_id,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "content_version": 1,
+            })
+        return rows
+
+    @staticmethod
+    def level(theme_id, parents):
+        level = 1
+        while parents[theme_id] is not None:
+            theme_id = parents[theme_id]
+            level += 1
+        return level
+
+    def sentences(self):
+        self.sentence_counts = {theme_id: 0 for theme_id in self.leaf_ids}
+        for sentence_id in range(1, self.args.sentences + 1):
+            theme_id = self.rng.choice(self.leaf_ids)
+            order_in_theme = self.sentence_counts[theme_id]
+            self.sentence_counts[theme_id] += 1
+            words = self.rng.sample(WORDS, 3)
+            yield {
+                "id": sentence_id,
+                "sentence": f"{words[0].capitalize()} ___ {words[1]} {words[2]} ({sentence_id}).",
+                "tense": self.rng.choice(TENSES),
+                "difficulty_level": self.rng.choice(DIFFICULTY_LEVELS),
+                "theme_id": theme_id,
+                "order_in_theme": order_in_theme,
+            }
+
+    def word_options(self):
+        sentences, options = self.args.sentences, self.args.options
+        option_id = 1
+        for sentence_id in range(1, sentences + 1):
+            # Spread the options evenly: the first (options % sentences) sentences get one more
+            count = options // sentences + (1 if sentence_id <= options % sentences else 0)
+            correct = self.rng.randrange(count) if count else -1
+            if count <= len(VERBS):
+                words = self.rng.sample(VERBS, count)
+            else:
+                words = [self.rng.choice(VERBS) for _ in range(count)]
+            for index, word in enumerate(words):
+                yield {
+                    "id": option_id,
+                    "unique_id": str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+                    "word": word,
+                    "is_correct": index == correct,
+                    "sentence_id": sentence_id,
+                }
+                option_id += 1
+
+    def users(self):
+        # bcrypt.gensalt() is random; a salt from the seeded rng keeps the users table reproducible
+        salt = b"$2b$%02d$" % BCRYPT_ROUNDS + bcrypt64.encode_bytes(self.rng.randbytes(16))
+        hashed_password = bcrypt.hashpw(self.args.password.encode(), salt).decode()
+        for user_id in range(1, self.args.users + 1):
+            yield {
+                "id": user_id,
+                "email": f"user{user_id}@example.com",
+                "hashed_password": hashed_password,
+                "created_at": self.timestamp(),
+            }
+
+    def progress(self):
+        """Progress rows, distinct per (user, theme), spread evenly over the users."""
+        users, rows = self.args.users, self.args.progress
+        if not users or not rows:
+            return
+        progress_id = 1
+        for user_id in range(1, users + 1):
+            count = rows // users + (1 if user_id <= rows % users else 0)
+            for theme_id in self.rng.sample(self.leaf_ids, count):
+                completed = self.rng.randint(0, self.sentence_counts[theme_id])
+                yield {
+                    "id": progress_id,
+                    "user_id": user_id,
+                    "theme_id": theme_id,
+                    "current_sentence_index": completed,
+                    "completed_sentences": completed,
+                    "last_accessed": self.timestamp(),
+                }
+                progress_id += 1
+
+    def run(self):
+        themes = self.themes()
+        if self.args.progress > self.args.users * len(self.leaf_ids):
+            sys.exit(f"--progress can be at most --users x leaf themes ({self.args.users * len(self.leaf_ids)})")
+        self.write(Theme, themes)
+        self.write(Sentence, self.sentences())
+        self.write(WordOption, self.word_options())
+        self.write(User, self.users())
+        self.write(UserProgress, self.progress())
+        if engine.dialect.name == "postgresql":
+            # Ids were given explicitly; move the sequences past them
+            with engine.begin() as connection:
+                for model in (Theme, Sentence, WordOption, User, UserProgress):
+                    table = model.__tablename__
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                    ))
+
+
+def check_empty():
+    with engine.connect() as connection:
+        for model in (Theme, Sentence, User):
+            if connection.execute(select(func.count()).select_from(model)).scalar():
+                sys.exit(f"{model.__tablename__} is not empty; generate into a fresh database (see DATABASE_URL)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--themes", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=3, help="levels in the theme tree")
+    parser.add_argument("--sentences", type=int, default=50000)
+    parser.add_argument("--options", type=int, default=200000, help="word options in total")
+    parser.add_argument("--progress", type=int, default=50000, help="user_progress rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="Synthetic1", help="password of every generated user")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per insert transaction")
+    args = parser.parse_args()
+    if args.themes < args.depth or args.depth < 1:
+        parser.error("--themes must be at least --depth, and --depth at least 1")
+
+    migrate()
+    check_empty()
+    started = time.perf_counter()
+    Generator(args).run()
+    print(f"Dataset generated in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
+import argparse
 import json
+import time
 import uuid
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import insert, select
+from database import SessionLocal
 from models import Base, Sentence, WordOption, Theme
+from catalog import catalog_store
+from content_pack import iter_records
 
-# Adjust the DB path if needed
-db_url = "sqlite:///./database.db"
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Records inserted per executemany batch in the bulk importer
+INSERT_BATCH_SIZE = 1000
 
 def get_or_create_theme(db, theme_name, subtheme_name=None):
     if subtheme_name:
@@ -33,10 +35,160 @@ def get_or_create_theme(db, theme_name, subtheme_name=None):
             db.refresh(theme)
         return theme
 
+class BulkImporter:
+    """Imports sentences with set-based duplicate checks and executemany inserts.
+
+    Nothing is committed here; the caller decides when to commit.
+    Existing themes are loaded up front, and the sentences already stored for
+    a theme are loaded with one query the first time that theme is seen.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.theme_ids = {
+            (name, parent_id): theme_id
+            for theme_id, name, parent_id in db.execute(select(Theme.id, Theme.name, Theme.parent_theme_id))
+        }
+        self.existing = {}
+        self.changed_themes = set()
+        self.sentences = 0
+        self.options = 0
+
+    def theme_id(self, theme_name, subtheme_name=None):
+        return self.path_theme_id((theme_name, subtheme_name) if subtheme_name else (theme_name,))
+
+    def path_theme_id(self, theme_path):
+        theme_id = None
+        for name in theme_path:
+            theme_id = self._theme_id(name, theme_id)
+        return theme_id
+
+    def _theme_id(self, name, parent_id):
+        key = (name, parent_id)
+        if key not in self.theme_ids:
+            theme = Theme(name=name, parent_theme_id=parent_id)
+            self.db.add(theme)
+            self.db.flush()  # Get theme.id
+            self.theme_ids[key] = theme.id
+        return self.theme_ids[key]
+
+    def existing_sentences(self, theme_id):
+        if theme_id not in self.existing:
+            self.existing[theme_id] = set(
+                self.db.execute(select(Sentence.sentence).where(Sentence.theme_id == theme_id)).scalars()
+            )
+        return self.existing[theme_id]
+
+    def add_records(self, records):
+        """Insert the new sentences of a list of content_pack.SentenceRecord."""
+        by_theme = {}
+        for record in records:
+            theme_id = self.path_theme_id(record.theme_path)
+            by_theme.setdefault(theme_id, []).append((record.order_in_theme, record.sentence))
+        for theme_id, sentences in by_theme.items():
+            self.add_sentences(theme_id, sentences)
+
+    def bump_changed_themes(self):
+        """Bump the content version of the themes that received sentences since the last call."""
+        if self.changed_themes:
+            self.db.execute(Theme.content_version_bump(self.changed_themes))
+            self.changed_themes = set()
+
+    def add_sentences(self, theme_id, sentences):
+        """Insert (order_in_theme, sentence dict) pairs that are not in the theme yet."""
+        existing = self.existing_sentences(theme_id)
+        new_sentences = []
+        for idx, sent in sentences:
+            if sent["sentence"] in existing:
+                continue
+            existing.add(sent["sentence"])
+            new_sentences.append((idx, sent))
+        if not new_sentences:
+            return
+        sentence_ids = self.db.execute(
+            insert(Sentence).returning(Sentence.id, sort_by_parameter_order=True),
+            [
+                {
+                    "sentence": sent["sentence"],
+                    "tense": sent["tense"],
+                    "difficulty_level": sent["difficulty_level"],
+                    "theme_id": theme_id,
+                    "order_in_theme": idx
+                } for idx, sent in new_sentences
+            ]
+        ).scalars().all()
+        option_rows = [
+            {
+                "unique_id": str(uuid.uuid4()),
+                "word": option["word"],
+                "is_correct": option["is_correct"],
+                "sentence_id": sentence_id
+            }
+            for sentence_id, (_, sent) in zip(sentence_ids, new_sentences)
+            for option in sent["word_options"]
+        ]
+        if option_rows:
+            self.db.execute(insert(WordOption), option_rows)
+        self.changed_themes.add(theme_id)
+        self.sentences += len(new_sentences)
+        self.options += len(option_rows)
+
+def report(importer, started):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    rows = importer.sentences + importer.options
+    print(
+        f"Imported {importer.sentences} sentences and {importer.options} word options "
+        f"in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)"
+    )
+
+def bulk_import_sentences(json_path, chunk_size=0, resume_from=0):
+    """Import a content pack (JSON array or JSONL) read as a stream.
+
+    With `chunk_size` 0 the whole pack is imported in a single transaction;
+    otherwise a commit follows every `chunk_size` sentence records.  Records
+    before `resume_from` are skipped, so a failed chunked import can be
+    resumed from the offset it reports.
+    """
+    started = time.perf_counter()
+    db = SessionLocal()
+    importer = BulkImporter(db)
+    committed = resume_from
+    pending = 0
+    batch = []
+    try:
+        for offset, record in enumerate(iter_records(json_path)):
+            if offset < resume_from:
+                continue
+            batch.append(record)
+            chunk_full = chunk_size and pending + len(batch) >= chunk_size
+            if chunk_full or len(batch) >= INSERT_BATCH_SIZE:
+                importer.add_records(batch)
+                pending += len(batch)
+                batch = []
+            if chunk_full:
+                importer.bump_changed_themes()
+                db.commit()
+                committed += pending
+                pending = 0
+                print(f"Committed {committed} records")
+        importer.add_records(batch)
+        importer.bump_changed_themes()
+        db.commit()
+        catalog_store.invalidate()
+        report(importer, started)
+    except Exception:
+        db.rollback()
+        catalog_store.invalidate()
+        print(f"Import failed; rerun with --resume-from {committed} to continue")
+        raise
+    finally:
+        db.close()
+
 def import_sentences(json_path):
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     db = SessionLocal()
+    changed_themes = set()
     try:
         for theme_entry in data:
             theme_name = theme_entry["theme"]
@@ -58,6 +210,7 @@ def import_sentences(json_path):
                     order_in_theme=idx
                 )
                 db.add(sentence)
+                changed_themes.add(theme.id)
                 db.flush()  # Get sentence.id
                 for option in sent["word_options"]:
                     word_option = WordOption(
@@ -67,10 +220,22 @@ def import_sentences(json_path):
                         sentence_id=sentence.id
                     )
                     db.add(word_option)
+        if changed_themes:
+            db.execute(Theme.content_version_bump(changed_themes))
         db.commit()
+        catalog_store.invalidate()
         print("Sentences imported successfully!")
     finally:
         db.close()
 
 if __name__ == "__main__":
-    import_sentences("sentences_data.json")
+    parser = argparse.ArgumentParser(description="Import sentences from a JSON or JSONL content pack")
+    parser.add_argument("json_path", nargs="?", default="sentences_data.json")
+    parser.add_argument("--row-by-row", action="store_true", help="use the old per-sentence import instead of the bulk import")
+    parser.add_argument("--chunk-size", type=int, default=0, help="commit every N sentences (default: one transaction)")
+    parser.add_argument("--resume-from", type=int, default=0, help="skip the first N sentences of the pack")
+    args = parser.parse_args()
+    if args.row_by_row:
+        import_sentences(args.json_path)
+    else:
+        bulk_import_sentences(args.json_path, chunk_size=args.chunk_size, resume_from=args.resume_from)
@@ -1,9 +1,9 @@
 import sqlite3
 import os
-import json
 import uuid
 from datetime import datetime
 import bcrypt
+from content_pack import iter_records
 
 # Ensure the database file exists
 db_path = "./database.db"
@@ -35,10 +35,16 @@ CREATE TABLE IF NOT EXISTS themes (
     parent_theme_id INTEGER,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    content_version INTEGER NOT NULL DEFAULT 1,
     FOREIGN KEY (parent_theme_id) REFERENCES themes (id)
 )
 """)
 
+# Databases created before content_version existed
+cursor.execute("PRAGMA table_info(themes)")
+if "content_version" not in [column[1] for column in cursor.fetchall()]:
+    cursor.execute("ALTER TABLE themes ADD COLUMN content_version INTEGER NOT NULL DEFAULT 1")
+
 # Create sentences table
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS sentences (
@@ -52,6 +58,11 @@ CREATE TABLE IF NOT EXISTS sentences (
 )
 """)
 
+# Index for ordered sentence lookups within a theme
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS ix_sentences_theme_order ON sentences (theme_id, order_in_theme)
+""")
+
 # Create word_options table
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS word_options (
@@ -78,6 +89,14 @@ CREATE TABLE IF NOT EXISTS user_progress (
 )
 """)
 
+# One progress row per user and theme; progress upserts rely on this index
+try:
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS ix_user_progress_user_theme ON user_progress (user_id, theme_id)
+    """)
+except sqlite3.IntegrityError as e:
+    print(f"Warning: duplicate user_progress rows, unique index not created: {str(e)}")
+
 conn.commit()
 print("Tables created successfully")
 
@@ -103,54 +122,31 @@ else:
     print(f"Test user already exists")
 
 # Function to get or create a theme
-def get_or_create_theme(theme_name, subtheme_name=None):
-    if subtheme_name:
-        # Check if parent theme exists
+def get_or_create_theme(theme_name, parent_id=None):
+    if parent_id is None:
         cursor.execute("SELECT id FROM themes WHERE name = ? AND parent_theme_id IS NULL", (theme_name,))
-        parent_result = cursor.fetchone()
-        
-        if parent_result:
-            parent_id = parent_result[0]
-        else:
-            # Create parent theme
-            cursor.execute(
-                "INSERT INTO themes (name, description, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                (theme_name, None, datetime.utcnow().isoformat(), datetime.utcnow().isoformat())
-            )
-            parent_id = cursor.lastrowid
-            conn.commit()
-        
-        # Check if subtheme exists
-        cursor.execute("SELECT id FROM themes WHERE name = ? AND parent_theme_id = ?", (subtheme_name, parent_id))
-        subtheme_result = cursor.fetchone()
-        
-        if subtheme_result:
-            return subtheme_result[0]
-        else:
-            # Create subtheme
-            cursor.execute(
-                "INSERT INTO themes (name, description, parent_theme_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
-                (subtheme_name, None, parent_id, datetime.utcnow().isoformat(), datetime.utcnow().isoformat())
-            )
-            theme_id = cursor.lastrowid
-            conn.commit()
-            return theme_id
     else:
-        # Check if theme exists
-        cursor.execute("SELECT id FROM themes WHERE name = ? AND parent_theme_id IS NULL", (theme_name,))
-        theme_result = cursor.fetchone()
-        
-        if theme_result:
-            return theme_result[0]
-        else:
-            # Create theme
-            cursor.execute(
-                "INSERT INTO themes (name, description, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                (theme_name, None, datetime.utcnow().isoformat(), datetime.utcnow().isoformat())
-            )
-            theme_id = cursor.lastrowid
-            conn.commit()
-            return theme_id
+        cursor.execute("SELECT id FROM themes WHERE name = ? AND parent_theme_id = ?", (theme_name, parent_id))
+    theme_result = cursor.fetchone()
+    
+    if theme_result:
+        return theme_result[0]
+    else:
+        # Create theme
+        cursor.execute(
+            "INSERT INTO themes (name, description, parent_theme_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (theme_name, None, parent_id, datetime.utcnow().isoformat(), datetime.utcnow().isoformat())
+        )
+        theme_id = cursor.lastrowid
+        conn.commit()
+        return theme_id
+
+# Walk a theme path (names from the root theme down), creating missing levels
+def get_or_create_theme_path(theme_path):
+    theme_id = None
+    for theme_name in theme_path:
+        theme_id = get_or_create_theme(theme_name, theme_id)
+    return theme_id
 
 # Import sentences from JSON file
 def import_sentences():
@@ -162,9 +158,6 @@ def import_sentences():
     print(f"Importing sentences from {json_path}...")
     
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
         # Check if sentences already exist
         cursor.execute("SELECT COUNT(*) FROM sentences")
         sentence_count = cursor.fetchone()[0]
@@ -173,26 +166,32 @@ def import_sentences():
             print(f"Found {sentence_count} existing sentences, skipping import")
             return
         
-        for theme_entry in data:
-            theme_name = theme_entry["theme"]
-            subtheme_name = theme_entry.get("subtheme")
-            theme_id = get_or_create_theme(theme_name, subtheme_name)
+        # Stream the pack record by record instead of loading it whole
+        theme_ids = {}
+        for theme_path, idx, sent in iter_records(json_path):
+            if theme_path not in theme_ids:
+                theme_ids[theme_path] = get_or_create_theme_path(theme_path)
+            theme_id = theme_ids[theme_path]
+            
+            # Insert sentence
+            cursor.execute(
+                "INSERT INTO sentences (sentence, tense, difficulty_level, theme_id, order_in_theme) VALUES (?, ?, ?, ?, ?)",
+                (sent["sentence"], sent["tense"], sent["difficulty_level"], theme_id, idx)
+            )
+            sentence_id = cursor.lastrowid
             
-            for idx, sent in enumerate(theme_entry["sentences"]):
-                # Insert sentence
+            # Insert word options
+            for option in sent["word_options"]:
                 cursor.execute(
-                    "INSERT INTO sentences (sentence, tense, difficulty_level, theme_id, order_in_theme) VALUES (?, ?, ?, ?, ?)",
-                    (sent["sentence"], sent["tense"], sent["difficulty_level"], theme_id, idx)
+                    "INSERT INTO word_options (unique_id, word, is_correct, sentence_id) VALUES (?, ?, ?, ?)",
+                    (str(uuid.uuid4()), option["word"], option["is_correct"], sentence_id)
                 )
-                sentence_id = cursor.lastrowid
-                
-                # Insert word options
-                for option in sent["word_options"]:
-                    cursor.execute(
-                        "INSERT INTO word_options (unique_id, word, is_correct, sentence_id) VALUES (?, ?, ?, ?)",
-                        (str(uuid.uuid4()), option["word"], option["is_correct"], sentence_id)
-                    )
         
+        # Mark the themes' sentences as changed (ETags, catalog fingerprint)
+        cursor.executemany(
+            "UPDATE themes SET content_version = content_version + 1 WHERE id = ?",
+            [(theme_id,) for theme_id in set(theme_ids.values())]
+        )
         conn.commit()
         print("Sentences imported successfully!")
     except Exception as e:
@@ -0,0 +1,101 @@
+"""Application logging through a queue, so request handlers never block on stdout.
+
+``setup_logging`` prepares a ``QueueHandler`` whose records are only
+formatted and written by a ``QueueListener`` thread.  The app installs both
+in its lifespan with ``start_logging`` and removes them with
+``stop_logging``; the root level is only changed in between, so code that
+imports the app without running it (scripts, benchmarks) keeps Python's
+default logging instead of filling a queue that nobody drains.
+
+``LOG_LEVEL`` sets the level (default INFO).  Below the level,
+``logger.debug(...)`` returns before a record is even created.  At DEBUG,
+loggers from ``get_logger`` (the app's own) keep only a
+``LOG_DEBUG_SAMPLE_RATE`` fraction (default 0.1) of their debug calls, so
+enabling DEBUG in production neither floods the output nor pays for a
+``LogRecord`` on every call.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Wraps a logger so ``debug`` drops all but a ``sample_rate`` fraction of calls.
+
+    The sampling happens before the record is built, which is where most of
+    the cost of a logging call goes.  An adapter rather than a logger class,
+    so using it does not change what ``logging.getLogger`` returns elsewhere.
+    """
+    sample_rate = 1.0
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def debug(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.DEBUG) and (self.sample_rate >= 1 or random.random() < self.sample_rate):
+            self.log(logging.DEBUG, msg, *args, **kwargs)
+
+
+def get_logger(name: str) -> SampledLogger:
+    """``logging.getLogger(name)`` with sampled debug calls."""
+    return SampledLogger(logging.getLogger(name))
+
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_running = False
+_previous_level = logging.NOTSET
+
+
+def setup_logging(stream=None) -> logging.handlers.QueueListener:
+    """Build the queue and its writer; idempotent, returns the listener."""
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is None:
+            log_queue = queue.SimpleQueue()
+            _queue_handler = logging.handlers.QueueHandler(log_queue)
+            writer = logging.StreamHandler(stream or sys.stdout)
+            writer.setFormatter(logging.Formatter(LOG_FORMAT))
+            _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+        return _listener
+
+
+def start_logging(level: str = LOG_LEVEL, debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE) -> None:
+    """Set the level, route the root logger through the queue and start the writer.
+
+    Runs once until ``stop_logging``, which puts the previous root level back.
+    """
+    global _running, _previous_level
+    listener = setup_logging()
+    with _lock:
+        if not _running:
+            root = logging.getLogger()
+            _previous_level = root.level
+            SampledLogger.sample_rate = debug_sample_rate
+            root.setLevel(level)
+            listener.start()
+            root.addHandler(_queue_handler)
+            _running = True
+
+
+def stop_logging() -> None:
+    """Detach the queue, flush the queued records and stop the writer."""
+    global _running
+    with _lock:
+        if _running:
+            root = logging.getLogger()
+            root.removeHandler(_queue_handler)
+            _listener.stop()
+            root.setLevel(_previous_level)
+            SampledLogger.sample_rate = 1.0
+            _running = False
@@ -1,18 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body, Request
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, status, Body, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
 from typing import List, Optional
-from sqlalchemy import create_engine
+from sqlalchemy import case, insert, literal, select, update, DateTime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload, sessionmaker, declarative_base
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel, EmailStr
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import uuid
-import logging
+import hashlib
+import json
+import os
 import random
 
-from database import get_db, engine, Base
+from database import get_db, get_async_db, engine, async_engine, SessionLocal
+from catalog import catalog_store
+from schema import check_schema
+from cache import TTLCache
+from logging_setup import get_logger, start_logging, stop_logging
+from metrics import MetricsMiddleware, instrument_engine, metrics
+from passwords import PasswordPoolBusy, password_hasher
 from models import (
     Theme,
     Sentence,
@@ -30,13 +47,45 @@ from models import (
     SentenceResponse,
     ThemeCreate,
     ThemeResponse,
-    UserProgressResponse
+    UserProgressResponse,
+    ProgressBatch,
+    ProgressBatchResponse,
+    BulkRegistration,
+    BulkRegistrationResponse
 )
 
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Verify the schema version and warm the catalog; never changes the database."""
+    start_logging()
+    timings = {"import": (_import_finished - _import_started) * 1000}
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        revision = check_schema(connection)
+    timings["db_connect"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        catalog_store.get(db)
+    finally:
+        db.close()
+    timings["cache_warmup"] = (time.perf_counter() - started) * 1000
+    app.state.startup_timings = timings
+    logger.info(
+        "Startup complete (schema %s): import %.1f ms, db connect %.1f ms, cache warmup %.1f ms",
+        revision, timings["import"], timings["db_connect"], timings["cache_warmup"]
+    )
+    yield
+    password_hasher.shutdown()
+    stop_logging()
+
 app = FastAPI(
     title="Polish Grammar API",
     description="API for Polish Grammar learning app",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -46,89 +95,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cross-origin clients may only read these response headers if listed
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Database configuration
-SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+# Per-route latency, status codes and SQL statements, exported at /metrics
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+templates = Jinja2Templates(directory="templates")
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Database configuration (engine, sessions, DATABASE_URL) lives in database.py
 
 # All models are imported from models.py - no need to define them here
-
-# Ensure database tables are created
-print("Initializing database tables...")
-
-# First try direct SQLite initialization
-import subprocess
-import os
-
-try:
-    print("Running direct SQLite initialization script...")
-    # Check if the script exists
-    if os.path.exists("init_railway_db.py"):
-        result = subprocess.run(["python", "init_railway_db.py"], capture_output=True, text=True)
-        print(f"Initialization script output: {result.stdout}")
-        if result.stderr:
-            print(f"Initialization script errors: {result.stderr}")
-    else:
-        print("Initialization script not found, falling back to SQLAlchemy")
-        
-    # Also try SQLAlchemy initialization as a backup
-    from models import User, Theme, Sentence, WordOption, UserProgress  # Import all models to ensure they're registered
-    Base.metadata.create_all(bind=engine)
-    print("SQLAlchemy tables created successfully")
-    
-    # Try to create a test user if needed
-    db = SessionLocal()
-    try:
-        # Try to get user count
-        try:
-            user_count = db.query(User).count()
-            print(f"Found {user_count} users in database")
-            
-            # If no users, create a test user
-            if user_count == 0:
-                print("Creating test user...")
-                hashed_password = pwd_context.hash("Qwerty12")
-                test_user = User(
-                    email="test1@mail.ru",
-                    hashed_password=hashed_password,
-                    created_at=datetime.utcnow()
-                )
-                db.add(test_user)
-                db.commit()
-                print("Test user created successfully")
-        except Exception as e:
-            print(f"Error checking users: {str(e)}")
-    finally:
-        db.close()
-except Exception as e:
-    print(f"Error during database initialization: {str(e)}")
-    
-print("Database initialization complete")
+# The schema is managed by Alembic: run `python bootstrap.py` before starting the app
 
 # --- Auth and Security Utilities ---
 SECRET_KEY = "supersecretkey123"  # Change in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
+# Comma-separated emails of users allowed to call the /api/admin endpoints
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Authenticated users keyed by token subject (email), so get_current_user
+# does not open a session and query the users table on every request.
+# Entries are detached User rows; call invalidate_principal() when a user changes.
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+metrics.add_cache("principal", principal_cache)
+
+def invalidate_principal(email: str):
+    principal_cache.pop(email)
+
+# Verified claims keyed by a digest of the token, kept until the token's exp,
+# so a token presented again skips the signature check. The digest is keyed
+# with SECRET_KEY: after a key rotation old entries can no longer be hit.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+metrics.add_cache("token", token_cache)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def token_cache_key(token: str) -> bytes:
+    secret = hashlib.blake2b(SECRET_KEY.encode(), digest_size=32).digest()
+    return hashlib.blake2b(token.encode(), digest_size=16, key=secret).digest()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def decode_token(token: str) -> dict:
+    """Verified claims of ``token``; raises JWTError if it is invalid or expired."""
+    key = token_cache_key(token)
+    claims = token_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = claims.get("exp")
+        ttl = None if exp is None else exp - time.time()
+        if ttl is None or ttl > 0:
+            token_cache.set(key, claims, ttl)
+    return claims
+
+metrics.add_gauge("password_jobs_pending", "Password hash/verify jobs queued or running.", lambda: password_hasher.pending)
+metrics.add_counter("password_jobs_rejected_total", "Password jobs refused because the queue was full.", lambda: password_hasher.rejected)
+
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many password checks in progress, please retry",
+        headers={"Retry-After": "1"}
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -140,11 +173,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def get_user_by_email(db, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
-        return False
-    return user
+def get_completed_sentences(db, user_id: int, theme_ids) -> dict:
+    """Map theme id -> completed sentences for a user, fetched in a single query."""
+    if not theme_ids:
+        return {}
+    rows = db.query(UserProgress.theme_id, UserProgress.completed_sentences).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.theme_id.in_(theme_ids)
+    ).all()
+    return {theme_id: completed for theme_id, completed in rows}
+
+def upsert_progress(db, stmt):
+    """Run an INSERT into user_progress that adds to the existing row on conflict.
+
+    The increment happens inside the database in a single statement, so
+    concurrent submissions cannot lose updates or race on _user_theme_uc.
+    Returns (theme_id, completed_sentences) rows for the written progress.
+    """
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserProgress.user_id, UserProgress.theme_id],
+        set_={
+            "current_sentence_index": UserProgress.current_sentence_index + stmt.excluded.current_sentence_index,
+            "completed_sentences": UserProgress.completed_sentences + stmt.excluded.completed_sentences,
+            # Replayed offline answers may be older than the stored access time
+            "last_accessed": case(
+                (UserProgress.last_accessed.is_(None), stmt.excluded.last_accessed),
+                (stmt.excluded.last_accessed > UserProgress.last_accessed, stmt.excluded.last_accessed),
+                else_=UserProgress.last_accessed
+            )
+        }
+    ).returning(UserProgress.theme_id, UserProgress.completed_sentences)
+    return db.execute(stmt).all()
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """``value`` as a naive UTC datetime, the form stored in the DateTime columns."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def progress_insert(db):
+    """The dialect-specific insert() that supports ON CONFLICT for the session's database."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(UserProgress)
+    return sqlite.insert(UserProgress)
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
@@ -153,147 +224,331 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
+    user = principal_cache.get(token_data.email)
+    if user is not None:
+        return user
     db = SessionLocal()
-    user = get_user_by_email(db, token_data.email)
-    db.close()
+    try:
+        user = get_user_by_email(db, token_data.email)
+    finally:
+        db.close()
     if user is None:
         raise credentials_exception
+    principal_cache.set(token_data.email, user)
     return user
 
+def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 # --- User Registration Endpoint ---
 # Using models from models.py
 
 @app.post("/api/register", response_model=RegisterResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user.email).first()
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = (await db.execute(select(User.id).where(User.email == user.email))).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = pwd_context.hash(user.password)
+    # Return the connection to the pool while the password is hashed
+    await db.rollback()
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     db_user = User(email=user.email, hashed_password=hashed_password, created_at=datetime.utcnow())
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_principal(db_user.email)
     return RegisterResponse(id=db_user.id, email=db_user.email)
 
+@app.post("/api/admin/users/bulk", response_model=BulkRegistrationResponse)
+async def register_users_bulk(
+    batch: BulkRegistration,
+    admin: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create many accounts (e.g. a school class) in one transaction.
+
+    Existing emails are checked with one query and the passwords are hashed
+    in parallel in the password process pool. Every row gets a result:
+    "created" with its id, or "exists"/"duplicate" when it was skipped.
+    """
+    emails = {user.email for user in batch.users}
+    existing = set((await db.execute(select(User.email).where(User.email.in_(emails)))).scalars()) if emails else set()
+
+    results = []
+    new_users = []
+    seen = set()
+    for index, user in enumerate(batch.users):
+        result = {"index": index, "email": user.email}
+        if user.email in existing:
+            result.update(status="exists", detail="Email already registered")
+        elif user.email in seen:
+            result.update(status="duplicate", detail="Email repeated in this batch")
+        else:
+            result["status"] = "created"
+            new_users.append((result, user))
+            seen.add(user.email)
+        results.append(result)
+
+    if new_users:
+        # Return the connection to the pool while the passwords are hashed
+        await db.rollback()
+        try:
+            hashed_passwords = await password_hasher.hash_many([user.password for _, user in new_users])
+        except PasswordPoolBusy:
+            raise password_pool_busy()
+        created_at = datetime.utcnow()
+        try:
+            rows = await db.execute(insert(User).returning(User.id, User.email), [
+                {"email": user.email, "hashed_password": hashed_password, "created_at": created_at}
+                for (_, user), hashed_password in zip(new_users, hashed_passwords)
+            ])
+            ids = {email: user_id for user_id, email in rows}
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Some emails were registered concurrently, please retry")
+        for result, user in new_users:
+            result["id"] = ids[user.email]
+            invalidate_principal(user.email)
+
+    logger.info("%s registered %d users in bulk", admin.email, len(new_users))
+    return {"created": len(new_users), "results": results}
+
 # --- User Login Endpoint ---
 @app.post("/api/login", response_model=Token)
-def login(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     try:
-        print(f"Login attempt for email: {login_data.email}")
+        logger.debug("Login attempt for email: %s", login_data.email)
         
         # Get the user from the database
-        db_user = get_user_by_email(db, login_data.email)
-        print(f"User found: {db_user is not None}")
+        db_user = (await db.execute(
+            select(User.id, User.email, User.hashed_password).where(User.email == login_data.email)
+        )).first()
+        # Return the connection to the pool while the password is verified
+        await db.rollback()
         
         if not db_user:
-            print("User not found, raising 401")
+            logger.info("Login failed for %s: user not found", login_data.email)
             raise HTTPException(status_code=401, detail="User not found")
         
-        # Verify the password
-        password_valid = verify_password(login_data.password, db_user.hashed_password)
-        print(f"Password valid: {password_valid}")
+        # Verify the password in the password process pool
+        try:
+            password_valid, new_hash = await password_hasher.verify(login_data.password, db_user.hashed_password)
+        except PasswordPoolBusy:
+            raise password_pool_busy()
         
         if not password_valid:
-            print("Password invalid, raising 401")
+            logger.info("Login failed for %s: incorrect password", login_data.email)
             raise HTTPException(status_code=401, detail="Incorrect password")
         
+        # The stored hash uses another cost factor than BCRYPT_ROUNDS: replace it
+        if new_hash is not None:
+            await db.execute(update(User).where(User.id == db_user.id).values(hashed_password=new_hash))
+            await db.commit()
+            invalidate_principal(db_user.email)
+            logger.info("Rehashed password for %s", db_user.email)
+        
         # Create and return the access token
-        print("Creating access token")
         access_token = create_access_token(data={"sub": db_user.email})
-        print("Access token created successfully")
+        logger.debug("Access token created for %s", db_user.email)
         
         return {"access_token": access_token, "token_type": "bearer"}
-    except Exception as e:
-        print(f"Error in login endpoint: {str(e)}")
-        print(f"Exception type: {type(e).__name__}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+    except HTTPException:
         raise
+    except Exception:
+        logger.exception("Error in login endpoint")
+        raise
+
+# --- Conditional GET helpers ---
+def make_etag(*parts) -> str:
+    """Strong ETag for a response built from `parts` (catalog fingerprint, content versions, user progress, params).
+
+    The fingerprint is read from the database, so every worker computes the same ETag;
+    it changes when content is replaced even though theme ids and versions are reused.
+    """
+    return '"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+def not_modified(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """Set the validator headers; return a 304 response if the client already has `etag`."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+# --- Pre-serialized response bodies ---
+# Encoded JSON of the content endpoints keyed by (endpoint, catalog snapshot version, ...),
+# so hot requests skip building dicts, response_model validation and json.dumps.
+# Snapshot versions are never reused within the process (theme ids and content
+# versions are, after content is replaced), so entries never go stale; the TTL only
+# bounds how long bodies of replaced snapshots stay in memory.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+metrics.add_cache("response", response_cache)
+
+def encode_json(content) -> bytes:
+    """Encode like FastAPI's JSONResponse, so cached bodies match the uncached ones byte for byte."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def cached_body(key, build):
+    body = response_cache.get(key)
+    if body is None:
+        body = build()
+        response_cache.set(key, body)
+    return body
+
+def json_bytes_response(body: bytes, response: Response) -> Response:
+    """Raw JSON response for an encoded body, keeping the headers already set on `response`."""
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+def encode_sentences(sentences) -> bytes:
+    return encode_json([SentenceResponse.model_validate(sentence.as_dict()).model_dump(mode="json") for sentence in sentences])
+
+def encode_theme_parts(themes):
+    """Encode ThemeResponse objects as (theme_id, head, tail) with completed_sentences left out.
+
+    The per-user value is spliced in between head and tail by `render_themes`.
+    """
+    parts = []
+    for theme in themes:
+        data = ThemeResponse.model_validate({
+            "id": theme.id,
+            "name": theme.name,
+            "description": theme.description,
+            "total_sentences": theme.total_sentences,
+            "completed_sentences": 0,
+            "created_at": theme.created_at,
+            "updated_at": theme.updated_at
+        }).model_dump(mode="json")
+        keys = list(data)
+        split = keys.index("completed_sentences")
+        head = encode_json({key: data[key] for key in keys[:split]})[:-1] + b',"completed_sentences":'
+        tail = encode_json({key: data[key] for key in keys[split + 1:]})[1:]
+        parts.append((theme.id, head, tail if tail == b"}" else b"," + tail))
+    return tuple(parts)
+
+def render_themes(parts, completed_by_theme) -> bytes:
+    return b"[" + b",".join(
+        head + str(completed_by_theme.get(theme_id, 0)).encode() + tail
+        for theme_id, head, tail in parts
+    ) + b"]"
 
 # --- Theme Management Endpoints ---
 @app.get("/api/themes", response_model=List[ThemeResponse])
-def get_themes(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_themes(
+    request: Request,
+    http_response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """Get all main themes and their subthemes, with sentence counts and user progress."""
     try:
-        print(f"Fetching themes for user: {current_user.email}")
-        
         # Get all main themes (those without a parent)
-        print("Querying main themes")
-        main_themes = db.query(Theme).filter(Theme.parent_theme_id.is_(None)).all()
-        print(f"Found {len(main_themes)} main themes")
+        catalog = catalog_store.get(db)
+        main_themes = catalog.root_themes()
         
-        response = []
-        for theme in main_themes:
-            print(f"Processing theme: {theme.id} - {theme.name}")
-            
-            # Get user progress for this theme
-            print(f"Querying progress for user {current_user.id} and theme {theme.id}")
-            progress = db.query(UserProgress).filter_by(user_id=current_user.id, theme_id=theme.id).first()
-            completed = progress.completed_sentences if progress else 0
-            print(f"Completed sentences: {completed}")
-            
-            # Get sentence count
-            sentence_count = len(theme.sentences)
-            print(f"Total sentences: {sentence_count}")
-            
-            # Build response object
-            theme_response = {
-                "id": theme.id,
-                "name": theme.name,
-                "description": theme.description,
-                "total_sentences": sentence_count,
-                "completed_sentences": completed,
-                "created_at": theme.created_at,
-                "updated_at": theme.updated_at
-            }
-            response.append(theme_response)
-            print(f"Added theme to response: {theme.name}")
-        
-        print(f"Returning {len(response)} themes")
-        return response
-    except Exception as e:
-        print(f"Error in get_themes endpoint: {str(e)}")
-        print(f"Exception type: {type(e).__name__}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        # Get user progress for all main themes at once
+        completed_by_theme = get_completed_sentences(db, current_user.id, [theme.id for theme in main_themes])
+        
+        versions = tuple((theme.id, theme.content_version) for theme in main_themes)
+        etag = make_etag("themes", catalog.fingerprint, current_user.id, versions, sorted(completed_by_theme.items()))
+        cached = not_modified(request, http_response, etag, "private, no-cache")
+        if cached is not None:
+            return cached
+        
+        parts = cached_body(("themes", catalog.version), lambda: encode_theme_parts(main_themes))
+        logger.debug("Returning %d themes for user %s", len(parts), current_user.id)
+        return json_bytes_response(render_themes(parts, completed_by_theme), http_response)
+    except Exception:
+        logger.exception("Error in get_themes endpoint")
         raise
 
 @app.get("/api/themes/{theme_id}/subthemes", response_model=List[ThemeResponse])
-def get_subthemes(theme_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_subthemes(
+    theme_id: int,
+    request: Request,
+    http_response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """Get all subthemes for a specific theme, including correct total_sentences and user progress."""
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
-    if not theme:
+    catalog = catalog_store.get(db)
+    if catalog.get_theme(theme_id) is None:
         raise HTTPException(status_code=404, detail="Theme not found")
-    subthemes = theme.get_all_subthemes()
-    response = []
-    for subtheme in subthemes:
-        progress = db.query(UserProgress).filter_by(user_id=current_user.id, theme_id=subtheme.id).first()
-        completed = progress.completed_sentences if progress else 0
-        response.append({
-            "id": subtheme.id,
-            "name": subtheme.name,
-            "description": subtheme.description,
-            "total_sentences": len(subtheme.sentences),
-            "completed_sentences": completed,
-            "created_at": subtheme.created_at,
-            "updated_at": subtheme.updated_at
-        })
-    return response
+    subthemes = catalog.all_subthemes(theme_id)
+    completed_by_theme = get_completed_sentences(db, current_user.id, [subtheme.id for subtheme in subthemes])
+    versions = tuple((subtheme.id, subtheme.content_version) for subtheme in subthemes)
+    etag = make_etag("subthemes", catalog.fingerprint, theme_id, current_user.id, versions, sorted(completed_by_theme.items()))
+    cached = not_modified(request, http_response, etag, "private, no-cache")
+    if cached is not None:
+        return cached
+    parts = cached_body(("subthemes", catalog.version, theme_id), lambda: encode_theme_parts(subthemes))
+    return json_bytes_response(render_themes(parts, completed_by_theme), http_response)
+
+MAX_SENTENCE_PAGE_SIZE = 500
+
+def parse_sentence_cursor(cursor: str):
+    """Decode a '<order_in_theme>:<id>' sentence cursor."""
+    try:
+        order_in_theme, sentence_id = cursor.split(":")
+        return int(order_in_theme), int(sentence_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
 
 @app.get("/api/themes/{theme_id}/sentences", response_model=List[SentenceResponse])
-def get_theme_sentences(theme_id: int, db: Session = Depends(get_db)):
-    """Get all sentences for a theme or subtheme."""
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
-    if not theme:
+def get_theme_sentences(
+    theme_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_SENTENCE_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get sentences for a theme or subtheme, ordered by order_in_theme.
+
+    Without `limit` all sentences are returned. With `limit`, one page is returned
+    and, if more follow, the `X-Next-Cursor` header holds the `cursor` for the next page.
+    Responses carry an ETag; a matching If-None-Match is answered with 304 from the catalog alone.
+    """
+    catalog = catalog_store.get(db)
+    theme = catalog.get_theme(theme_id)
+    if theme is None:
         raise HTTPException(status_code=404, detail="Theme not found")
-    return theme.sentences
+    etag = make_etag("sentences", catalog.fingerprint, theme_id, theme.content_version, limit, cursor)
+    cached = not_modified(request, response, etag, "no-cache")
+    if cached is not None:
+        return cached
+    if limit is None and cursor is None:
+        body = cached_body(
+            ("sentences", catalog.version, theme_id),
+            lambda: encode_sentences(catalog.theme_sentences(theme_id))
+        )
+        return json_bytes_response(body, response)
+    after = parse_sentence_cursor(cursor) if cursor is not None else None
+
+    def build_page():
+        page, next_key = catalog.theme_sentences_page(theme_id, after, limit or MAX_SENTENCE_PAGE_SIZE)
+        return encode_sentences(page), next_key
+
+    body, next_key = cached_body(("sentences", catalog.version, theme_id, limit, after), build_page)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = f"{next_key[0]}:{next_key[1]}"
+    return json_bytes_response(body, response)
 
 @app.get("/api/themes/{theme_id}/progress", response_model=UserProgressResponse)
 def get_theme_progress(theme_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -308,18 +563,19 @@ def get_next_sentence(theme_id: int, current_user: User = Depends(get_current_us
     """Get the next sentence for the user in the theme/subtheme."""
     try:
         # Step 1: Get the theme
-        theme = db.query(Theme).filter(Theme.id == theme_id).first()
-        if not theme:
+        catalog = catalog_store.get(db)
+        if catalog.get_theme(theme_id) is None:
             raise HTTPException(status_code=404, detail="Theme not found")
             
-        # Step 2: Get all sentences for this theme
-        sentences = db.query(Sentence).filter(Sentence.theme_id == theme_id).order_by(Sentence.order_in_theme).all()
+        # Step 2: Get all sentences for this theme (ordered by order_in_theme)
+        sentences = catalog.theme_sentences(theme_id)
         if not sentences:
             raise HTTPException(status_code=404, detail="No sentences in this theme")
             
         # Step 3: Get user progress
-        progress = db.query(UserProgress).filter_by(user_id=current_user.id, theme_id=theme_id).first()
-        next_index = progress.current_sentence_index if progress else 0
+        next_index = db.query(UserProgress.current_sentence_index).filter_by(
+            user_id=current_user.id, theme_id=theme_id
+        ).scalar() or 0
         
         # Step 4: Validate index
         if next_index < 0:
@@ -327,34 +583,12 @@ def get_next_sentence(theme_id: int, current_user: User = Depends(get_current_us
         if next_index >= len(sentences):
             raise HTTPException(status_code=404, detail="No more sentences left in this theme")
             
-        # Step 5: Get the next sentence
-        sentence = sentences[next_index]
-        
-        # Step 6: Get word options separately
-        word_options = db.query(WordOption).filter(WordOption.sentence_id == sentence.id).all()
-        
-        # Step 7: Create the response
-        return {
-            "id": sentence.id,
-            "sentence": sentence.sentence,
-            "tense": sentence.tense,
-            "difficulty_level": sentence.difficulty_level,
-            "word_options": [
-                {
-                    "unique_id": opt.unique_id,
-                    "word": opt.word,
-                    "is_correct": opt.is_correct
-                } for opt in word_options
-            ],
-            "theme_id": sentence.theme_id,
-            "order_in_theme": sentence.order_in_theme
-        }
+        # Step 5: Get the next sentence (word options are part of the snapshot)
+        return sentences[next_index].as_dict()
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        logging.error(f"Full traceback for get_next_sentence error: {tb}")
+        logger.exception("Error in get_next_sentence endpoint")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
 @app.post("/api/progress")
@@ -374,55 +608,89 @@ def update_progress(request: dict = Body(...), current_user: User = Depends(get_
     except (ValueError, TypeError):
         raise HTTPException(status_code=422, detail="theme_id and sentence_id must be integers")
     try:
-        print(f"[DEBUG] Updating progress for user {current_user.id} ({current_user.email}), theme {theme_id}, sentence {sentence_id}")
+        logger.debug("Updating progress for user %s, theme %s, sentence %s", current_user.id, theme_id, sentence_id)
         
-        # Step 1: Get the theme
-        theme = db.query(Theme).filter(Theme.id == theme_id).first()
-        if not theme:
-            print(f"[DEBUG] Theme {theme_id} not found")
-            raise HTTPException(status_code=404, detail="Theme not found")
-        print(f"[DEBUG] Found theme: {theme.id} - {theme.name}")
-        
-        # Step 2: Get the sentence
-        sentence = db.query(Sentence).filter(Sentence.id == sentence_id, Sentence.theme_id == theme_id).first()
-        if not sentence:
-            print(f"[DEBUG] Sentence {sentence_id} not found in theme {theme_id}")
+        # Insert or increment the progress row in one statement; the SELECT only
+        # yields a row when the sentence belongs to the theme
+        now = datetime.utcnow()
+        stmt = progress_insert(db).from_select(
+            ["user_id", "theme_id", "current_sentence_index", "completed_sentences", "last_accessed"],
+            select(
+                literal(current_user.id),
+                Sentence.theme_id,
+                literal(1),
+                literal(1),
+                literal(now, DateTime)
+            ).where(Sentence.id == sentence_id, Sentence.theme_id == theme_id)
+        )
+        rows = upsert_progress(db, stmt)
+        if not rows:
+            db.rollback()
+            if db.query(Theme.id).filter(Theme.id == theme_id).first() is None:
+                raise HTTPException(status_code=404, detail="Theme not found")
             raise HTTPException(status_code=404, detail="Sentence not found in this theme")
-        print(f"[DEBUG] Found sentence: {sentence.id} - {sentence.sentence}")
-        
-        # Step 3: Get or create user progress
-        progress = db.query(UserProgress).filter_by(user_id=current_user.id, theme_id=theme_id).first()
-        if not progress:
-            print(f"[DEBUG] No existing progress found, creating new progress record")
-            progress = UserProgress(
-                user_id=current_user.id,
-                theme_id=theme_id,
-                current_sentence_index=1,
-                completed_sentences=1,
-                last_accessed=datetime.utcnow()
-            )
-            db.add(progress)
-            print(f"[DEBUG] Created new progress: completed_sentences=1")
-        else:
-            print(f"[DEBUG] Existing progress found: completed_sentences={progress.completed_sentences}")
-            progress.current_sentence_index += 1
-            progress.completed_sentences += 1
-            progress.last_accessed = datetime.utcnow()
-            print(f"[DEBUG] Updated progress: completed_sentences={progress.completed_sentences}")
-        
-        # Step 4: Commit changes
+        completed = rows[0].completed_sentences
         db.commit()
-        print(f"[DEBUG] Successfully committed progress update")
+        logger.debug("Committed progress update: completed_sentences=%s", completed)
         
-        return {"status": "success", "completed_sentences": progress.completed_sentences}
+        return {"status": "success", "completed_sentences": completed}
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"[ERROR] Error updating progress: {str(e)}")
-        import traceback
-        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        logger.exception("Error updating progress")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/api/progress/batch", response_model=ProgressBatchResponse)
+def update_progress_batch(batch: ProgressBatch, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Apply many completed sentences (e.g. replayed from an offline client) in one transaction.
+
+    Each entry counts like one POST /api/progress call. Entries whose sentence
+    does not exist in the given theme are rejected individually; the rest are applied.
+    """
+    # Validate all entries with one query: sentence id -> theme id
+    sentence_ids = {entry.sentence_id for entry in batch.entries}
+    sentence_themes = dict(
+        db.query(Sentence.id, Sentence.theme_id).filter(Sentence.id.in_(sentence_ids)).all()
+    ) if sentence_ids else {}
+
+    rejected = []
+    answered_by_theme = {}
+    for index, entry in enumerate(batch.entries):
+        if sentence_themes.get(entry.sentence_id) != entry.theme_id:
+            rejected.append({
+                "index": index,
+                "theme_id": entry.theme_id,
+                "sentence_id": entry.sentence_id,
+                "detail": "Sentence not found in this theme"
+            })
+            continue
+        answered_by_theme.setdefault(entry.theme_id, []).append(naive_utc(entry.answered_at) or datetime.utcnow())
+
+    # Insert or increment every touched theme's progress in one statement
+    themes = []
+    if answered_by_theme:
+        stmt = progress_insert(db).values([
+            {
+                "user_id": current_user.id,
+                "theme_id": theme_id,
+                "current_sentence_index": len(answered),
+                "completed_sentences": len(answered),
+                "last_accessed": max(answered)
+            } for theme_id, answered in answered_by_theme.items()
+        ])
+        themes = [
+            {"theme_id": theme_id, "completed_sentences": completed}
+            for theme_id, completed in upsert_progress(db, stmt)
+        ]
+    db.commit()
+
+    return {
+        "status": "success",
+        "applied": len(batch.entries) - len(rejected),
+        "rejected": rejected,
+        "themes": themes
+    }
+
 @app.post("/api/themes/{theme_id}/reset_progress")
 def reset_theme_progress(theme_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
@@ -463,18 +731,16 @@ def reset_theme_progress(theme_id: int, current_user: User = Depends(get_current
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"[ERROR] Error resetting progress: {str(e)}")
-        import traceback
-        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        logger.exception("Error resetting progress")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/api/themes/{theme_id}/subthemes", response_model=List[ThemeResponse])
 def get_subthemes(theme_id: int, db: Session = Depends(get_db)):
     """Get all subthemes for a specific theme, including correct total_sentences."""
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
-    if not theme:
+    catalog = catalog_store.get(db)
+    if catalog.get_theme(theme_id) is None:
         raise HTTPException(status_code=404, detail="Theme not found")
-    subthemes = theme.get_all_subthemes()
+    subthemes = catalog.all_subthemes(theme_id)
     response = []
     for subtheme in subthemes:
         response.append(
@@ -482,7 +748,7 @@ def get_subthemes(theme_id: int, db: Session = Depends(get_db)):
                 id=subtheme.id,
                 name=subtheme.name,
                 description=subtheme.description,
-                total_sentences=len(subtheme.sentences),
+                total_sentences=subtheme.total_sentences,
                 created_at=subtheme.created_at,
                 updated_at=subtheme.updated_at
             )
@@ -494,6 +760,7 @@ def create_theme(theme: ThemeCreate, db: Session = Depends(get_db)):
     db_theme = Theme(**theme.dict())
     db.add(db_theme)
     db.commit()
+    catalog_store.invalidate()
     db.refresh(db_theme)
     return db_theme
 
@@ -510,32 +777,103 @@ def get_user_progress(current_user: User = Depends(get_current_user), db: Sessio
 
 @app.get("/web")
 async def database_viewer(request: Request):
+    sentences = (await catalog_store.get_async()).sentences
+    return templates.TemplateResponse("index.html", {
+        "request": request,
+        "sentences": sentences
+    })
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+def export_sentences_ndjson(chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield the sentence catalog as NDJSON, one chunk of bytes per `chunk_size` fetched rows.
+
+    Sentences and their options are read with a single streamed query
+    (server-side cursor on Postgres), so memory use does not grow with the catalog.
+    """
     db = SessionLocal()
     try:
-        sentences = db.query(Sentence).all()
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "sentences": sentences
-        })
+        themes = {row.id: row for row in db.query(Theme.id, Theme.name, Theme.parent_theme_id)}
+
+        def theme_path(theme_id):
+            path = []
+            while theme_id is not None and theme_id in themes and len(path) < len(themes):
+                path.append(themes[theme_id].name)
+                theme_id = themes[theme_id].parent_theme_id
+            return path[::-1]
+
+        stmt = (
+            select(
+                Sentence.id, Sentence.sentence, Sentence.tense, Sentence.difficulty_level,
+                Sentence.theme_id, Sentence.order_in_theme,
+                WordOption.unique_id, WordOption.word, WordOption.is_correct
+            )
+            .outerjoin(WordOption, WordOption.sentence_id == Sentence.id)
+            .order_by(Sentence.theme_id, Sentence.order_in_theme, Sentence.id, WordOption.id)
+            .execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        record = None
+        for rows in db.execute(stmt).partitions():
+            lines = []
+            for row in rows:
+                if record is None or record["id"] != row.id:
+                    if record is not None:
+                        lines.append(json.dumps(record, ensure_ascii=False))
+                    record = {
+                        "theme_path": theme_path(row.theme_id),
+                        "theme_id": row.theme_id,
+                        "id": row.id,
+                        "sentence": row.sentence,
+                        "tense": row.tense,
+                        "difficulty_level": row.difficulty_level,
+                        "order_in_theme": row.order_in_theme,
+                        "word_options": []
+                    }
+                if row.unique_id is not None:
+                    record["word_options"].append(
+                        {"unique_id": row.unique_id, "word": row.word, "is_correct": row.is_correct}
+                    )
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+        if record is not None:
+            yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
     finally:
         db.close()
 
+@app.get("/api/export/sentences")
+def export_sentences(current_user: User = Depends(get_current_user)):
+    """Stream every sentence with its theme path and word options as NDJSON."""
+    return StreamingResponse(
+        export_sentences_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="sentences.ndjson"'}
+    )
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request, SQL and cache metrics in the Prometheus text format."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/sentences/random", response_model=SentenceResponse)
-async def get_random_sentence():
-    db = SessionLocal()
+async def get_random_sentence(
+    tense: Optional[str] = None,
+    difficulty_level: Optional[int] = None,
+    theme_id: Optional[int] = None
+):
+    """Get a random sentence, optionally filtered by tense, difficulty and theme (including subthemes)."""
     try:
-        # Get all sentences and select a random one
-        sentences = db.query(Sentence).all()
-        if not sentences:
+        # Pick from the precomputed sampling buckets of the catalog snapshot
+        sampler = (await catalog_store.get_async()).sampler
+        random_sentence = sampler.choice(theme_id=theme_id, tense=tense, difficulty_level=difficulty_level)
+        if random_sentence is None:
             raise HTTPException(status_code=404, detail="No sentences available")
         
-        random_sentence = random.choice(sentences)
-        # Randomize the order of word options
-        word_options = random_sentence.word_options
+        # Randomize the order of word options (on a copy, the snapshot is shared)
+        word_options = list(random_sentence.word_options)
         random.shuffle(word_options)
         
         # Convert SQLAlchemy objects to Pydantic models
@@ -552,32 +890,46 @@ async def get_random_sentence():
             sentence=random_sentence.sentence,
             tense=random_sentence.tense,
             difficulty_level=random_sentence.difficulty_level,
-            word_options=word_option_responses
+            word_options=word_option_responses,
+            theme_id=random_sentence.theme_id,
+            order_in_theme=random_sentence.order_in_theme
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 @app.post("/api/sentences", response_model=SentenceResponse)
-async def create_sentence(sentence: SentenceCreate):
-    db = SessionLocal()
-    try:
-        db_sentence = Sentence(**sentence.dict())
-        db.add(db_sentence)
-        db.commit()
-        db.refresh(db_sentence)
-        return db_sentence
-    finally:
-        db.close()
+async def create_sentence(sentence: SentenceCreate, db: AsyncSession = Depends(get_async_db)):
+    word_options = [
+        WordOption(unique_id=opt.unique_id, word=opt.word, is_correct=opt.is_correct)
+        for opt in sentence.word_options
+    ]
+    db_sentence = Sentence(**sentence.dict(exclude={"word_options"}), word_options=word_options)
+    db.add(db_sentence)
+    await db.execute(Theme.content_version_bump([sentence.theme_id]))
+    await db.commit()
+    catalog_store.invalidate()
+    return {
+        "id": db_sentence.id,
+        "sentence": db_sentence.sentence,
+        "tense": db_sentence.tense,
+        "difficulty_level": db_sentence.difficulty_level,
+        "word_options": [
+            {"unique_id": opt.unique_id, "word": opt.word, "is_correct": opt.is_correct}
+            for opt in word_options
+        ],
+        "theme_id": db_sentence.theme_id,
+        "order_in_theme": db_sentence.order_in_theme
+    }
 
 def init_db():
     """Initialize the database with themes and subthemes."""
+    # The schema comes from the Alembic migrations, as in bootstrap.py
+    from bootstrap import migrate
+    migrate()
     db = SessionLocal()
     try:
-        # Create tables
-        Base.metadata.create_all(bind=engine)
-        
         # Create main themes
         cases = Theme(
             name="Cases",
@@ -719,10 +1071,10 @@ def init_db():
     finally:
         db.close()
 
+_import_finished = time.perf_counter()
+
 if __name__ == "__main__":
-    import logging
-    # Configure logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+    start_logging()
     init_db()
+    stop_logging()
     # Do not run uvicorn here; Railway will start the server using the external command.
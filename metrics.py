@@ -0,0 +1,241 @@
+"""Request and database metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and labels it with the route
+template (``/api/themes/{theme_id}/sentences``, not the concrete path), so
+the number of series stays bounded.  ``instrument_engine`` hooks SQLAlchemy's
+cursor events and adds each statement's count and time to the request that
+issued it, found through a context variable that follows the request into
+the threadpool.  ``Metrics.render`` produces the ``/metrics`` payload.
+
+With ``N_PLUS_ONE_THRESHOLD`` set (dev/test only), each request also counts
+its statements by SQL text.  Statements are parameterised, so the same text
+repeated N times in one request is the signature of an N+1 loop; the route
+and the statement are logged as a warning.
+
+Everything is plain counters behind one lock; no client library is needed.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "unmatched"
+# Repeats of one statement within a request reported as N+1; 0 disables the detector
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """SQL statements issued while handling one request."""
+    __slots__ = ("statements", "statement_seconds", "shapes")
+
+    def __init__(self, track_shapes: bool = False):
+        self.statements = 0
+        self.statement_seconds = 0.0
+        self.shapes: Optional[Counter] = Counter() if track_shapes else None
+
+
+def repeated_statements(statements: Iterable[str], threshold: int) -> List[Tuple[str, int]]:
+    """Statements occurring at least ``threshold`` times, most repeated first."""
+    counts = statements if isinstance(statements, Counter) else Counter(statements)
+    return [(statement, count) for statement, count in counts.most_common() if count >= threshold]
+
+
+def describe_statement(statement: str, width: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= width else statement[:width] + "..."
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        prefix = labels + "," if labels else ""
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        braces = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}_sum{braces} {self.sum}")
+        lines.append(f"{name}_count{braces} {self.count}")
+        return lines
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self._lock = threading.Lock()
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.n_plus_one: Dict[str, int] = {}
+        self.in_flight = 0
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.statements: Dict[str, Histogram] = {}
+        self.statement_seconds: Dict[str, Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.caches = {}
+        self.callbacks = []
+
+    def add_cache(self, name: str, cache) -> None:
+        """Export the ``stats()`` of a ``cache.TTLCache``."""
+        self.caches[name] = cache
+
+    def add_gauge(self, name: str, help_text: str, read) -> None:
+        """Export ``read()`` as a gauge, called at scrape time."""
+        self.callbacks.append((name, "gauge", help_text, read))
+
+    def add_counter(self, name: str, help_text: str, read) -> None:
+        """Export ``read()`` as a counter, called at scrape time."""
+        self.callbacks.append((name, "counter", help_text, read))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            histogram = self.durations.get((method, route))
+            if histogram is None:
+                histogram = self.durations[(method, route)] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            histogram = self.statements.get(route)
+            if histogram is None:
+                histogram = self.statements[route] = Histogram(STATEMENT_BUCKETS)
+                self.statement_seconds[route] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(stats.statements)
+            self.statement_seconds[route].observe(stats.statement_seconds)
+            key = (method, route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+        if stats.shapes:
+            self.check_n_plus_one(method, route, stats.shapes)
+
+    def check_n_plus_one(self, method: str, route: str, shapes: Counter) -> None:
+        repeated = repeated_statements(shapes, self.n_plus_one_threshold)
+        if not repeated:
+            return
+        with self._lock:
+            self.n_plus_one[route] = self.n_plus_one.get(route, 0) + 1
+        for statement, count in repeated:
+            logger.warning(
+                "Possible N+1 in %s %s: statement executed %d times: %s",
+                method, route, count, describe_statement(statement)
+            )
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("http_requests_in_flight", "gauge", "HTTP requests being handled.")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+            header("http_requests_total", "counter", "HTTP responses by route and status code.")
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+                )
+            header("http_request_duration_seconds", "histogram", "Time to handle an HTTP request.")
+            for (method, route), histogram in sorted(self.durations.items()):
+                lines.extend(histogram.samples(
+                    "http_request_duration_seconds", f'method="{method}",route="{_label(route)}"'
+                ))
+            header("db_statements_per_request", "histogram", "SQL statements executed per HTTP request.")
+            for route, histogram in sorted(self.statements.items()):
+                lines.extend(histogram.samples("db_statements_per_request", f'route="{_label(route)}"'))
+            header("db_statement_seconds_per_request", "histogram", "Time spent in SQL statements per HTTP request.")
+            for route, histogram in sorted(self.statement_seconds.items()):
+                lines.extend(histogram.samples("db_statement_seconds_per_request", f'route="{_label(route)}"'))
+            if self.n_plus_one_threshold:
+                header("db_n_plus_one_requests_total", "counter", "Requests that repeated a SQL statement N+1 style.")
+                for route, count in sorted(self.n_plus_one.items()):
+                    lines.append(f'db_n_plus_one_requests_total{{route="{_label(route)}"}} {count}')
+
+        for stat, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+            name = f"cache_{stat}_total" if kind == "counter" else f"cache_{stat}"
+            header(name, kind, f"In-process cache {stat}.")
+            for cache_name, cache in sorted(self.caches.items()):
+                lines.append(f'{name}{{cache="{cache_name}"}} {cache.stats()[stat]}')
+        for name, kind, help_text, read in self.callbacks:
+            header(name, kind, help_text)
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL statements per route."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats(track_shapes=self.metrics.n_plus_one_threshold > 0)
+        token = current_request.set(stats)
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight -= 1
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            self.metrics.observe_request(scope["method"], route_path, status, elapsed, stats)
+
+
+def instrument_engine(engine) -> None:
+    """Count the statements ``engine`` executes against the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_request.get() is not None:
+            conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            if stats.shapes is not None:
+                stats.shapes[statement] += 1
+            stats.statement_seconds += time.perf_counter() - conn.info.pop("metrics_started", time.perf_counter())
+
+
+metrics = Metrics()
@@ -0,0 +1,98 @@
+"""Initial schema
+
+Creates the tables of models.py.  Databases created before migrations
+existed (by init_railway_db.py or create_all) already have the tables, so
+each table is only created when missing, and the indexes the query paths
+rely on are added to existing tables.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "themes" not in existing:
+        op.create_table(
+            "themes",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("parent_theme_id", sa.Integer(), sa.ForeignKey("themes.id")),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.UniqueConstraint("name", "parent_theme_id", name="uix_theme_name_parent"),
+        )
+        op.create_index("ix_themes_id", "themes", ["id"])
+
+    if "sentences" not in existing:
+        op.create_table(
+            "sentences",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("sentence", sa.String()),
+            sa.Column("tense", sa.String()),
+            sa.Column("difficulty_level", sa.Integer()),
+            sa.Column("theme_id", sa.Integer(), sa.ForeignKey("themes.id")),
+            sa.Column("order_in_theme", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_sentences_id", "sentences", ["id"])
+        op.create_index("ix_sentences_sentence", "sentences", ["sentence"])
+    op.create_index("ix_sentences_theme_order", "sentences", ["theme_id", "order_in_theme"], if_not_exists=True)
+
+    if "word_options" not in existing:
+        op.create_table(
+            "word_options",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("unique_id", sa.String(), nullable=False, unique=True),
+            sa.Column("word", sa.String()),
+            sa.Column("is_correct", sa.Boolean()),
+            sa.Column("sentence_id", sa.Integer(), sa.ForeignKey("sentences.id")),
+        )
+        op.create_index("ix_word_options_id", "word_options", ["id"])
+
+    if "user_progress" not in existing:
+        op.create_table(
+            "user_progress",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("theme_id", sa.Integer(), sa.ForeignKey("themes.id")),
+            sa.Column("current_sentence_index", sa.Integer()),
+            sa.Column("completed_sentences", sa.Integer()),
+            sa.Column("last_accessed", sa.DateTime()),
+            sa.UniqueConstraint("user_id", "theme_id", name="_user_theme_uc"),
+        )
+        op.create_index("ix_user_progress_id", "user_progress", ["id"])
+    else:
+        # Tables from init_railway_db.py lack the unique constraint progress upserts need
+        op.create_index(
+            "ix_user_progress_user_theme", "user_progress", ["user_id", "theme_id"],
+            unique=True, if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_table("user_progress")
+    op.drop_table("word_options")
+    op.drop_table("sentences")
+    op.drop_table("themes")
+    op.drop_table("users")
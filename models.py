@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, UniqueConstraint, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import timedelta
 
 Base = declarative_base()
@@ -17,6 +17,8 @@ class Theme(Base):
     parent_theme_id = Column(Integer, ForeignKey("themes.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped whenever the theme's sentences change; used for ETags and catalog refreshes
+    content_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     __table_args__ = (
         UniqueConstraint('name', 'parent_theme_id', name='uix_theme_name_parent'),
@@ -30,6 +32,15 @@ class Theme(Base):
     def __repr__(self):
         return f"Theme(id={self.id}, name='{self.name}', parent_theme_id={self.parent_theme_id})"
 
+    @staticmethod
+    def content_version_bump(theme_ids):
+        """UPDATE statement marking the sentences of these themes as changed."""
+        return (
+            update(Theme)
+            .where(Theme.id.in_(list(theme_ids)))
+            .values(content_version=Theme.content_version + 1)
+        )
+
     def get_next_sentence(self, user_id: int) -> Optional['Sentence']:
         from database import SessionLocal
         db = SessionLocal()
@@ -122,6 +133,8 @@ class Sentence(Base):
     theme = relationship("Theme", back_populates="sentences")
     word_options = relationship("WordOption", back_populates="sentence", cascade="all, delete-orphan")
 
+    __table_args__ = (Index('ix_sentences_theme_order', 'theme_id', 'order_in_theme'),)
+
 # Pydantic models for API requests and responses
 class UserCreate(BaseModel):
     email: EmailStr
@@ -199,3 +212,45 @@ class UserProgressResponse(BaseModel):
     
     class Config:
         orm_mode = True
+
+MAX_PROGRESS_BATCH_SIZE = 1000
+
+class ProgressEntry(BaseModel):
+    theme_id: int
+    sentence_id: int
+    answered_at: Optional[datetime] = None
+
+class ProgressBatch(BaseModel):
+    entries: List[ProgressEntry] = Field(..., max_length=MAX_PROGRESS_BATCH_SIZE)
+
+class ProgressBatchRejection(BaseModel):
+    index: int
+    theme_id: int
+    sentence_id: int
+    detail: str
+
+class ProgressBatchTheme(BaseModel):
+    theme_id: int
+    completed_sentences: int
+
+class ProgressBatchResponse(BaseModel):
+    status: str
+    applied: int
+    rejected: List[ProgressBatchRejection]
+    themes: List[ProgressBatchTheme]
+
+MAX_REGISTRATION_BATCH_SIZE = 1000
+
+class BulkRegistration(BaseModel):
+    users: List[UserCreate] = Field(..., max_length=MAX_REGISTRATION_BATCH_SIZE)
+
+class BulkRegistrationResult(BaseModel):
+    index: int
+    email: EmailStr
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkRegistrationResponse(BaseModel):
+    created: int
+    results: List[BulkRegistrationResult]
@@ -0,0 +1,127 @@
+"""Password hashing off the request threads.
+
+bcrypt is deliberately slow, so hashing and verifying in the endpoints would
+tie up the AnyIO threadpool that every sync endpoint shares.  The async API
+of ``PasswordHasher`` runs the work in its own process pool instead, sized
+by ``PASSWORD_WORKERS``.  At most ``PASSWORD_QUEUE_LIMIT`` jobs may be
+pending or running; beyond that ``PasswordPoolBusy`` is raised and the
+endpoint answers 503, so a login burst is shed instead of queueing forever.
+A pool broken by a dead worker is replaced and its jobs also raise
+``PasswordPoolBusy``.
+
+``BCRYPT_ROUNDS`` sets the cost factor.  Hashes made with another cost are
+flagged by ``verify`` so the caller can store the rehash returned with it.
+
+``hash_many`` hashes a batch (bulk registration) in chunks of
+``PASSWORD_CHUNK_SIZE``, with at most one chunk per worker in flight, so the
+batch uses every core while logins still get a worker between chunks.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))
+PASSWORD_CHUNK_SIZE = int(os.getenv("PASSWORD_CHUNK_SIZE", "8"))
+
+# min == max rounds makes needs_update() true for hashes of any other cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Too many password jobs are already pending."""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash when the stored one uses another cost factor, else None)."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool; the pool starts on first use."""
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs threads (log writer, threadpool) is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        self.pending += 1
+        executor = self._pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool on the next job
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise PasswordPoolBusy()
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hashes of ``passwords``, in order; PasswordPoolBusy if any chunk is refused."""
+        chunks = [passwords[i:i + PASSWORD_CHUNK_SIZE] for i in range(0, len(passwords), PASSWORD_CHUNK_SIZE)]
+        in_flight = asyncio.Semaphore(self.workers)
+
+        async def hash_chunk(chunk):
+            async with in_flight:
+                return await self._run(hash_passwords, chunk)
+
+        tasks = [asyncio.ensure_future(hash_chunk(chunk)) for chunk in chunks]
+        try:
+            hashed = await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other chunks queued on the pool for a failed request
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [hashed_password for chunk in hashed for hashed_password in chunk]
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
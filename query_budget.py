@@ -0,0 +1,70 @@
+"""Query budgets for tests: fail when code issues more SQL than allowed.
+
+Loaded as a pytest plugin by the root ``conftest.py``; the ``query_budget``
+fixture returns ``assert_query_budget``:
+
+    def test_themes_query_budget(client, headers, query_budget):
+        client.get("/api/themes", headers=headers)  # warm the catalog
+        with query_budget(1):
+            client.get("/api/themes", headers=headers)
+
+The block fails when more than ``max_statements`` statements run on the
+app's engines, or when one statement repeats ``n_plus_one`` times (an N+1
+loop), listing the statements it saw.  The first request after start-up or
+a content write also loads the catalog, so warm it before measuring.
+"""
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+import pytest
+from sqlalchemy import event
+
+from metrics import describe_statement, repeated_statements
+
+DEFAULT_N_PLUS_ONE = 3
+
+
+class QueryRecorder:
+    """Collects the SQL text of every statement executed on ``engines``."""
+
+    def __init__(self, engines: Iterable):
+        self.engines = list(engines)
+        self.statements: List[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "after_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, "after_cursor_execute", self._record)
+
+
+def app_engines():
+    from database import async_engine, engine
+    return [engine, async_engine.sync_engine]
+
+
+@contextmanager
+def assert_query_budget(max_statements: int, n_plus_one: Optional[int] = DEFAULT_N_PLUS_ONE, engines=None):
+    """Fail if the block runs more than ``max_statements`` statements or an N+1 loop."""
+    with QueryRecorder(engines or app_engines()) as recorder:
+        yield recorder
+    problems = []
+    if len(recorder.statements) > max_statements:
+        problems.append(f"{len(recorder.statements)} statements executed, budget is {max_statements}")
+    if n_plus_one:
+        for statement, count in repeated_statements(recorder.statements, n_plus_one):
+            problems.append(f"possible N+1, executed {count} times: {describe_statement(statement)}")
+    if problems:
+        executed = "\n".join(f"  {describe_statement(statement)}" for statement in recorder.statements)
+        pytest.fail("\n".join(problems) + "\nStatements:\n" + executed, pytrace=False)
+
+
+@pytest.fixture
+def query_budget():
+    return assert_query_budget
@@ -0,0 +1,33 @@
+"""Schema version checks against the Alembic migrations in ./migrations."""
+import os
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    return config
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection):
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def check_schema(connection) -> str:
+    """Raise RuntimeError unless the database is migrated to the latest revision."""
+    current = current_revision(connection)
+    head = head_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}; run `python bootstrap.py` first"
+        )
+    return current
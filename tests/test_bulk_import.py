@@ -0,0 +1,23 @@
+import json
+
+import import_sentences
+
+
+def test_chunked_import_commits_every_chunk_size_records(replace_content, tmp_path, monkeypatch, capsys):
+    options = [{"word": "jest", "is_correct": True}, {"word": "są", "is_correct": False}]
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps([{
+        "theme": "Czas",
+        "subtheme": "Teraźniejszy",
+        "sentences": [
+            {"sentence": f"Zdanie {i} ___.", "tense": "present", "difficulty_level": 1, "word_options": options}
+            for i in range(14)
+        ],
+    }]), encoding="utf-8")
+    # A chunk size that is not a multiple of the insert batch size
+    monkeypatch.setattr(import_sentences, "INSERT_BATCH_SIZE", 4)
+
+    replace_content(lambda db: import_sentences.bulk_import_sentences(str(path), chunk_size=6))
+
+    committed = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Committed")]
+    assert committed == ["Committed 6 records", "Committed 12 records"]
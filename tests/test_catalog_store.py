@@ -0,0 +1,57 @@
+import threading
+import time
+
+from catalog import CatalogStore
+
+
+def test_stale_snapshot_is_served_while_another_reader_rebuilds(app):
+    import main
+    db = main.SessionLocal()
+    try:
+        store = CatalogStore(recheck_seconds=60)
+        snapshot = store.get(db)
+        store._checked_at = time.monotonic() - 120
+
+        refreshing = threading.Event()
+        release = threading.Event()
+
+        def hold_refresh():
+            # Stands in for another reader in the middle of a rebuild
+            with store._refresh_lock:
+                refreshing.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_refresh)
+        holder.start()
+        refreshing.wait(5)
+        try:
+            started = time.perf_counter()
+            assert store.get(db) is snapshot
+            assert time.perf_counter() - started < 1
+        finally:
+            release.set()
+            holder.join()
+        # The next reader does the recheck itself; the content is unchanged
+        assert store.get(db) is snapshot
+        assert time.monotonic() - store._checked_at < 60
+    finally:
+        db.close()
+
+
+def test_get_async_builds_off_the_event_loop(app):
+    import asyncio
+
+    import main
+    threads = []
+
+    def session_factory():
+        threads.append(threading.get_ident())
+        return main.SessionLocal()
+
+    async def load():
+        store = CatalogStore(session_factory=session_factory)
+        return store, await store.get_async(), threading.get_ident()
+
+    store, snapshot, loop_thread = asyncio.run(load())
+    assert snapshot.sentences
+    assert threads and loop_thread not in threads
@@ -0,0 +1,29 @@
+"""The queue logging is only in place between start_logging and stop_logging."""
+import logging
+
+import logging_setup
+from logging_setup import SampledLogger, get_logger, start_logging, stop_logging
+
+
+def test_start_and_stop_restore_the_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+
+    start_logging(level="DEBUG", debug_sample_rate=0.5)
+    try:
+        assert logging_setup._queue_handler in root.handlers
+        assert root.level == logging.DEBUG
+        assert SampledLogger.sample_rate == 0.5
+    finally:
+        stop_logging()
+
+    assert root.handlers == handlers
+    assert root.level == level
+    assert SampledLogger.sample_rate == 1.0
+
+
+def test_sampled_loggers_leave_the_logger_class_alone():
+    logger = get_logger("tests.sampled")
+    assert isinstance(logger, SampledLogger)
+    assert logging.getLoggerClass() is logging.Logger
+    assert type(logging.getLogger("tests.sampled")) is logging.Logger
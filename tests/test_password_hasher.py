@@ -0,0 +1,37 @@
+"""PasswordHasher.hash_many when the pool refuses a chunk."""
+import asyncio
+
+import pytest
+
+from passwords import PASSWORD_CHUNK_SIZE, PasswordHasher, PasswordPoolBusy
+
+
+def test_hash_many_cancels_other_chunks_when_one_is_refused():
+    hasher = PasswordHasher(workers=4)
+    started, cancelled = [], []
+
+    async def run(fn, chunk):
+        started.append(chunk)
+        if len(started) == 1:
+            await asyncio.sleep(0)
+            raise PasswordPoolBusy()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(chunk)
+            raise
+
+    hasher._run = run
+
+    async def hash_batch():
+        with pytest.raises(PasswordPoolBusy):
+            await hasher.hash_many(["password"] * (PASSWORD_CHUNK_SIZE * 6))
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    leftover = asyncio.run(hash_batch())
+
+    assert leftover == set()
+    # Every chunk that got a worker slot after the refused one was cancelled,
+    # and the last chunk never reached the pool
+    assert len(cancelled) == len(started) - 1
+    assert len(started) < 6
@@ -0,0 +1,43 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import Sentence, User, UserProgress
+
+SUBMISSIONS = 200
+THREADS = 16
+
+
+def test_parallel_progress_submissions_lose_no_increment(app):
+    """Parallel POST /api/progress for one user and theme must all be counted."""
+    import main
+    db = main.SessionLocal()
+    try:
+        sentence = db.query(Sentence).first()
+        # A fresh user, so the first submissions race on creating the progress row
+        user = User(email=f"stress-{uuid.uuid4().hex[:8]}@example.com", hashed_password="-", created_at=datetime.utcnow())
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        theme_id, sentence_id = sentence.theme_id, sentence.id
+    finally:
+        db.close()
+
+    def submit(_):
+        session = main.SessionLocal()
+        try:
+            main.update_progress({"theme_id": theme_id, "sentence_id": sentence_id}, current_user=user, db=session)
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(submit, range(SUBMISSIONS)))
+
+    db = main.SessionLocal()
+    try:
+        progress = db.query(UserProgress).filter_by(user_id=user.id, theme_id=theme_id).one()
+    finally:
+        db.close()
+    assert progress.completed_sentences == SUBMISSIONS
+    assert progress.current_sentence_index == SUBMISSIONS
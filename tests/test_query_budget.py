@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import select
+
+from models import Sentence, Theme
+
+
+@pytest.fixture(scope="module")
+def theme_ids(app):
+    """(id of a main theme, id of a subtheme with sentences) from the seed data."""
+    import main
+    db = main.SessionLocal()
+    try:
+        parent_id = db.query(Theme.id).filter(Theme.parent_theme_id.is_(None)).order_by(Theme.id).first()[0]
+        theme_id = db.query(Sentence.theme_id).order_by(Sentence.id).first()[0]
+    finally:
+        db.close()
+    return parent_id, theme_id
+
+
+def test_query_budget_fails_on_n_plus_one_loop(app, query_budget):
+    import main
+    db = main.SessionLocal()
+    try:
+        with pytest.raises(pytest.fail.Exception, match="possible N\\+1"):
+            with query_budget(100):
+                for theme_id in range(1, 6):
+                    db.execute(select(Theme).where(Theme.id == theme_id)).first()
+    finally:
+        db.close()
+
+
+def test_query_budget_fails_over_budget(app, query_budget):
+    import main
+    db = main.SessionLocal()
+    try:
+        with pytest.raises(pytest.fail.Exception, match="3 statements executed, budget is 2"):
+            with query_budget(2):
+                db.execute(select(Theme.id)).all()
+                db.execute(select(Sentence.id)).all()
+                db.execute(select(Theme.name)).all()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("path, authenticated, budget", [
+    ("/api/themes", True, 1),
+    ("/api/themes/{parent_id}/subthemes", True, 1),
+    ("/api/themes/{theme_id}/sentences", False, 0),
+    ("/api/themes/{theme_id}/next_sentence", True, 1),
+    ("/api/user/progress", True, 1),
+    ("/web", False, 0),
+])
+def test_endpoint_query_budget(client, headers, theme_ids, query_budget, path, authenticated, budget):
+    parent_id, theme_id = theme_ids
+    url = path.format(parent_id=parent_id, theme_id=theme_id)
+    request_headers = headers if authenticated else None
+    # The first request may load the catalog and the principal
+    client.get(url, headers=request_headers).raise_for_status()
+    with query_budget(budget):
+        response = client.get(url, headers=request_headers)
+    assert response.status_code == 200
+
+
+def test_unauthenticated_subthemes_query_budget(app, theme_ids, query_budget):
+    # Shadowed by the authenticated route of the same path; still served from the catalog
+    import main
+    db = main.SessionLocal()
+    try:
+        main.get_subthemes(theme_ids[0], db=db)
+        with query_budget(0):
+            main.get_subthemes(theme_ids[0], db=db)
+    finally:
+        db.close()
@@ -0,0 +1,58 @@
+import json
+
+
+def write_pack(path, theme, subtheme, sentences):
+    options = [{"word": "jest", "is_correct": True}, {"word": "są", "is_correct": False}]
+    path.write_text(json.dumps([{
+        "theme": theme,
+        "subtheme": subtheme,
+        "sentences": [
+            {"sentence": sentence, "tense": "present", "difficulty_level": 1, "word_options": options}
+            for sentence in sentences
+        ],
+    }]), encoding="utf-8")
+    return str(path)
+
+
+def import_pack(path):
+    from import_sentences import bulk_import_sentences
+    return lambda db: bulk_import_sentences(path)
+
+
+def first_subtheme(client, headers):
+    """(main theme id, its first subtheme as JSON)."""
+    parent_id = client.get("/api/themes", headers=headers).json()[0]["id"]
+    return parent_id, client.get(f"/api/themes/{parent_id}/subthemes", headers=headers).json()[0]
+
+
+def test_replaced_content_is_not_served_from_the_response_cache(client, headers, replace_content, tmp_path):
+    replace_content(import_pack(write_pack(tmp_path / "old.json", "Czas", "Teraźniejszy", ["Ona ___ w domu."])))
+    _, subtheme = first_subtheme(client, headers)
+    theme_id = subtheme["id"]
+    url = f"/api/themes/{theme_id}/sentences"
+    old = client.get(url)
+    assert [sentence["sentence"] for sentence in old.json()] == ["Ona ___ w domu."]
+    client.get(url + "?limit=1")
+
+    # Theme ids and content versions are reused by the fresh import
+    replace_content(import_pack(write_pack(tmp_path / "new.json", "Czas", "Przeszły", ["On ___ w pracy.", "My ___ razem."])))
+    _, subtheme = first_subtheme(client, headers)
+    assert subtheme["id"] == theme_id
+    assert subtheme["name"] == "Przeszły"
+    new = client.get(url)
+    assert [sentence["sentence"] for sentence in new.json()] == ["On ___ w pracy.", "My ___ razem."]
+    assert [sentence["sentence"] for sentence in client.get(url + "?limit=1").json()] == ["On ___ w pracy."]
+
+
+def test_etag_changes_when_content_is_replaced(client, headers, replace_content, tmp_path):
+    replace_content(import_pack(write_pack(tmp_path / "old.json", "Czas", "Teraźniejszy", ["Ona ___ w domu."])))
+    _, subtheme = first_subtheme(client, headers)
+    url = f"/api/themes/{subtheme['id']}/sentences"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    replace_content(import_pack(write_pack(tmp_path / "new.json", "Czas", "Przeszły", ["On ___ w pracy.", "My ___ razem."])))
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 2
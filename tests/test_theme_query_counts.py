@@ -0,0 +1,47 @@
+"""The theme listings run a fixed number of statements, however many themes exist."""
+from datetime import datetime
+
+import pytest
+
+from models import Sentence, Theme, WordOption
+
+SENTENCES_PER_SUBTHEME = 3
+
+
+@pytest.fixture
+def set_themes(replace_content):
+    """Replace the content with ``count`` main themes of two subthemes each."""
+
+    def add_themes(count, db):
+        now = datetime.utcnow()
+        parents = [Theme(name=f"Theme {n}", created_at=now, updated_at=now) for n in range(count)]
+        db.add_all(parents)
+        db.flush()
+        for parent in parents:
+            for n in range(2):
+                subtheme = Theme(name=f"Subtheme {n}", parent_theme_id=parent.id, created_at=now, updated_at=now)
+                subtheme.sentences = [
+                    Sentence(sentence=f"Zdanie ___ {i}.", tense="present", difficulty_level=1, order_in_theme=i,
+                             word_options=[WordOption(word="jest", is_correct=True), WordOption(word="są", is_correct=False)])
+                    for i in range(SENTENCES_PER_SUBTHEME)
+                ]
+                db.add(subtheme)
+        return [parent.id for parent in parents]
+
+    return lambda count: replace_content(lambda db: add_themes(count, db))
+
+
+@pytest.mark.parametrize("theme_count", [2, 20])
+def test_theme_listings_query_budget(client, headers, set_themes, query_budget, theme_count):
+    parent_ids = set_themes(theme_count)
+    subthemes_url = f"/api/themes/{parent_ids[-1]}/subthemes"
+    # Load the catalog before measuring
+    client.get("/api/themes", headers=headers).raise_for_status()
+
+    with query_budget(1):
+        response = client.get("/api/themes", headers=headers)
+    assert sorted(theme["id"] for theme in response.json()) == parent_ids
+
+    with query_budget(1):
+        response = client.get(subthemes_url, headers=headers)
+    assert [theme["total_sentences"] for theme in response.json()] == [SENTENCES_PER_SUBTHEME] * 2